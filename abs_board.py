@@ -8,9 +8,9 @@ I would prefer to do everything in terms of object-oriented programming though.
 """
 
 # Import: 
-# color GRAY; PLAYER_COLOR, NO_PLAYER
-# board dimension BSIZ
-from constants import PLAYER_COLOR, BSIZ, NO_PLAYER, GRAY
+# color GRAY; PLAYER_COLOR, NO_PLAYER, DRAW
+# board dimension BSIZ, stones in a row to win KROW; draw rules MAX_MOVES, REPETITIONS
+from constants import PLAYER_COLOR, BSIZ, KROW, NO_PLAYER, DRAW, GRAY, MAX_MOVES, REPETITIONS
 
 # Data structure for stones
 from collections import namedtuple
@@ -18,17 +18,63 @@ from collections import namedtuple
 # Tupla para saber la piedra seleccionada o movida por el jugador según sus coordenadas "x", "y" y su "color"
 Stone = namedtuple('Stone', ('x', 'y', 'color'))
 
+# Líneas ganadoras: todos los grupos de KROW casillas seguidas en horizontal, vertical o en una de
+# las dos diagonales, incluidas las diagonales más cortas que el tablero. WINDOWS[l] son las
+# casillas (i, j) de la línea l; con KROW == BSIZ son las filas, las columnas y las dos diagonales
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+WINDOWS = tuple(
+    tuple((i + d*di, j + d*dj) for d in range(KROW))
+    for di, dj in DIRECTIONS for i in range(BSIZ) for j in range(BSIZ)
+    if 0 <= i + (KROW - 1)*di < BSIZ and 0 <= j + (KROW - 1)*dj < BSIZ)
+N_LINES = len(WINDOWS)
 
-def set_board_up(stones_per_player = 4):
-    'Init stones and board, prepare functions to provide, act as their closure'
+# Para cada casilla (i, j), las líneas que pasan por ella: son las únicas que puede completar una
+# piedra colocada allí
+LINES_THROUGH = tuple(
+    tuple(tuple(line for line, cells in enumerate(WINDOWS) if (i, j) in cells) for j in range(BSIZ))
+    for i in range(BSIZ))
+
+# Símbolo de cada jugador en el tablero
+MARK = ('X', 'O')
+
+# Cada casilla (i, j) del tablero corresponde al bit i*BSIZ + j de un entero
+BIT = tuple(tuple(1 << (i*BSIZ + j) for j in range(BSIZ)) for i in range(BSIZ))
+
+# Máscara con los bits de todas las casillas
+FULL = (1 << BSIZ*BSIZ) - 1
+
+# Jugadas precalculadas, para que el generador de jugadas no tenga que crear ninguna tupla:
+# PLACE_MOVES[k] coloca una piedra en la casilla k = i*BSIZ + j y SLIDE_MOVES[s][k] mueve allí
+# la piedra de la casilla s. Ocupan N² y N⁴ tuplas, así que sirven también para tableros grandes
+PLACE_MOVES = tuple((None, divmod(k, BSIZ)) for k in range(BSIZ*BSIZ))
+SLIDE_MOVES = tuple(tuple((divmod(s, BSIZ), divmod(k, BSIZ)) for k in range(BSIZ*BSIZ))
+                    for s in range(BSIZ*BSIZ))
+
+# Todas las funciones que ofrece el tablero: las 4 de set_board_up() y las de los bots y la interfaz
+Engine = namedtuple('Engine', ('stones', 'select_st', 'move_st', 'draw_txt', 
+                               'make_move', 'unmake_move', 'undo', 'redo', 'legal_moves',
+                               'end', 'position', 'game_moves', 'txt', 'is_draw'))
+
+
+def set_board_up(stones_per_player = 4, max_moves = MAX_MOVES, repetitions = REPETITIONS, metrics = None):
+    'Init stones and board, return the 4 functions of the main programs'
+    return set_engine_up(stones_per_player, max_moves, repetitions, metrics)[:4]
+
+
+def set_engine_up(stones_per_player = 4, max_moves = MAX_MOVES, repetitions = REPETITIONS, metrics = None):
+    '''Init stones and board, prepare functions to provide, act as their closure.
+    The game is drawn when a position appears for the repetitions-th time
+    or after max_moves moves (None for no limit). With a metrics.Metrics
+    object, the calls to select_st, move_st, end and draw_txt are measured.'''
 
     # init board and game data here
 
     # Inicializamos la tabla BSIZxBSIZ con las casillas vacías
     board = [[" "]*BSIZ for _ in range(BSIZ)]
 
-    # Lista para guardar las piedras jugadas
-    played_stones = []
+    # Diccionario para guardar las piedras jugadas según su casilla (x, y), así quitar una piedra no 
+    # obliga a recorrer todas las demás
+    played_stones = {}
 
     # Para saber a qué jugador le toca // 0 --> Jugador 1 y 1 --> Jugador 2 
     # También tenemos pensado que la ficha 'X' correspondrá para el jugador 1 y la ficha 'O' para el jugador 2
@@ -42,11 +88,36 @@ def set_board_up(stones_per_player = 4):
 
     # Coordenadas de la piedra seleccionada. De momento no hay ninguna piedra seleccionada.
     stone_itself = (None, None)
+
+    # Número de piedras de cada jugador en cada línea (filas, columnas y diagonales). Se actualiza
+    # cada vez que se coloca o se quita una piedra, así no hay que recorrer todo el tablero en end()
+    line_count = [[0]*N_LINES for _ in range(2)]
+
+    # Una máscara de bits por jugador con las casillas que ocupa, para generar las jugadas legales
+    masks = [0, 0]
+
+    # Jugador que ha hecho KROW en raya, o NO_PLAYER si el juego aún no ha acabado
+    winner = NO_PLAYER
+
+    # Veces que ha aparecido cada posición, según su clave (ver position_key()), y si la partida
+    # ha acabado en tablas por repetición o por llegar a max_moves jugadas
+    seen = {}
+    drawn = False
+
+    # Pila con las jugadas hechas (y lo necesario para deshacerlas) y pila de jugadas deshechas
+    history = []
+    redo_stack = []
     
     
     def stones():
         "return iterable with the stones already played"
-        return played_stones
+        return played_stones.values()
+
+
+    # Clave de la posición actual: las dos máscaras y el jugador que mueve, en un solo entero.
+    # No hace falta el número de piedras por colocar: mientras se colocan, las máscaras ya lo dicen
+    def position_key():
+        return masks[0] | masks[1] << BSIZ*BSIZ | curr_player << 2*BSIZ*BSIZ
 
 
     # Llamamos esta función una vez que todas las piedras sean jugadas. Seleccionamos
@@ -101,49 +172,177 @@ def set_board_up(stones_per_player = 4):
             return False
 
 
-    # Función para comprobar si los jugadores han hecho 3 en raya horizontalmente, verticalmente o diagonalmente
+    # Función para comprobar si los jugadores han hecho KROW en raya horizontalmente, verticalmente o diagonalmente
     def end():
-        'Test whether there are 3 aligned stones'
+        'Test whether there are KROW aligned stones'
 
-        # Comprobar por filas
-        for i in range(BSIZ):
+        # No hace falta recorrer el tablero: move_st() ya ha mirado las líneas que pasan
+        # por la casilla donde se ha colocado la última piedra
+        return winner != NO_PLAYER
 
-            # Comprobamos si la primera piedra de la fila 'i' ([board[i][0]]) es igual que los otros elementos que 
-            # también están en la misma fila (board[i][j]). Además, nos aseguramos que las casillas que estamos
-            # comprobando no sea vacía (board[i][j] != " ").
-            if all(board[i][j] == board[i][0] and board[i][j] != " " for j in range(BSIZ)):
 
-                # Retornamos True si alguna de las filas cumple lo anteriormente dicho
-                return True
+    # Aplica una jugada completa sin comprobar que sea legal. Es la base de move_st() y de las
+    # búsquedas de los bots: no copia el tablero, solo cambia las casillas afectadas
+    def make_move(move):
+
+        '''
+        Play move = (src, dst) for the current player: src is None when
+        placing a new stone, else the (x, y) square of the stone to slide;
+        dst is the (i, j) destination square, assumed empty.
+        Save on the undo stack what unmake_move() needs to revert it.
+        '''
 
-        # Comprobar por columnas
-        for j in range(BSIZ):
+        nonlocal curr_player, stone_selected, total_stones, stone_itself, winner, drawn
 
-            # Comprobamos si la primera piedra de la columna 'j' ([board[0][j]]) es igual que los otros elementos que 
-            # también están en la misma columna (board[i][j]). 
-            if all(board[i][j] == board[0][j] and board[i][j] != " " for i in range(BSIZ)):
+        src, dst = move
+        i, j = dst
 
-                # Retornamos True si alguna de las columnas cumple lo anteriormente dicho
-                return True
+        # Guardamos los valores que la jugada va a cambiar para poder deshacerla
+        history.append((move, stone_selected, total_stones, stone_itself, winner, drawn))
 
-        # Comprobar por la diagonal principal:
-        # Comprobamos si la piedra que se encuentra en la primera fila y columna (board[0][0]) es igual que los demás
-        # piedras que se encuentran en la diagonal principal (board[i][i])
-        if all(board[i][i] == board[0][0] and board[i][i] != " " for i in range(BSIZ)):
+        # Si la jugada mueve una piedra ya jugada, la quitamos de su casilla
+        if src is not None:
+            x, y = src
+            del played_stones[src]
+            board[x][y] = " "
+            masks[curr_player] ^= BIT[x][y]
+            for line in LINES_THROUGH[x][y]:
+                line_count[curr_player][line] -= 1
+            stone_itself = src
 
-            # Retornamos True si la diagonal principal cumple lo anteriormente dicho
-            return True
-        
-        # Comprobar por la diagonal secundaria
-        # Comprobamos si la piedra que se encuentra en la primera fila y última columna (board[0][BSIZ-1]) es igual 
-        # que los demás piedras que se encuentran en la diagonal secundaria (board[i][BSIZ - 1 - i])
-        if all(board[i][BSIZ - 1 - i] == board[0][BSIZ - 1] and board[i][BSIZ - 1 - i] != " " for i in range(BSIZ)):
+        # Si no, es una piedra nueva y queda una piedra menos por colocar
+        else:
+            total_stones -= 1
 
-            # Retornamos True si la diagonal secundaria cumple lo anteriormente dicho
-            return True
-        
-        # Si ninguna de las condiciones anteriores fueron ciertas, quiere decir que el juego aún no ha acabado
-        return False
+        # Colocamos la piedra del jugador actual en (i, j)
+        board[i][j] = MARK[curr_player]
+        masks[curr_player] |= BIT[i][j]
+        played_stones[dst] = Stone(i, j, PLAYER_COLOR[curr_player])
+
+        # Contamos la piedra en las líneas que pasan por (i, j); si alguna se llena, el jugador ha ganado
+        for line in LINES_THROUGH[i][j]:
+            line_count[curr_player][line] += 1
+            if line_count[curr_player][line] == KROW:
+                winner = curr_player
+
+        # Cambiamos de jugador actual. Si ya no quedan piedras por colocar, el siguiente 
+        # jugador tendrá que seleccionar una de sus piedras antes de moverla
+        curr_player = 1 - curr_player
+        stone_selected = total_stones != 0
+
+        # Contamos la posición nueva: si se repite demasiadas veces o la partida es demasiado larga,
+        # son tablas (a menos que la jugada haya hecho KROW en raya)
+        key = position_key()
+        count = seen.get(key, 0) + 1
+        seen[key] = count
+        if winner == NO_PLAYER and (count >= repetitions or 
+                                    max_moves is not None and len(history) >= max_moves):
+            drawn = True
+
+
+    # Tablas por repetición o por límite de jugadas; end() solo mira si alguien ha hecho KROW en raya
+    def is_draw():
+        'Test whether the game has ended in a draw'
+        return drawn
+
+
+    # Valor de final de partida que devuelven move_st(), undo() y redo()
+    def game_over():
+        return DRAW if drawn else end()
+
+
+    # Deshace la última jugada hecha con make_move() dejando el estado exactamente como estaba
+    def unmake_move():
+
+        '''
+        Revert the last move played and return it.
+        '''
+
+        nonlocal curr_player, stone_selected, total_stones, stone_itself, winner, drawn
+
+        # La posición actual deja de contar como vista
+        key = position_key()
+        seen[key] -= 1
+
+        move, stone_selected, total_stones, stone_itself, winner, drawn = history.pop()
+        src, dst = move
+        i, j = dst
+
+        # La piedra era del jugador que ha hecho la jugada, es decir, del anterior
+        curr_player = 1 - curr_player
+
+        # Quitamos la piedra de su destino...
+        del played_stones[dst]
+        board[i][j] = " "
+        masks[curr_player] ^= BIT[i][j]
+        for line in LINES_THROUGH[i][j]:
+            line_count[curr_player][line] -= 1
+
+        # ...y, si se había movido, la volvemos a poner en su casilla de origen
+        if src is not None:
+            x, y = src
+            board[x][y] = MARK[curr_player]
+            masks[curr_player] |= BIT[x][y]
+            played_stones[src] = Stone(x, y, PLAYER_COLOR[curr_player])
+            for line in LINES_THROUGH[x][y]:
+                line_count[curr_player][line] += 1
+
+        return move
+
+
+    # Estado mínimo de la partida para los bots, sin copiar el tablero
+    def position():
+
+        '''
+        Return the stone masks of both players, the current player
+        and the number of stones still to be placed.
+        '''
+
+        return masks[0], masks[1], curr_player, total_stones
+
+
+    # Jugadas hechas hasta ahora, para reproducir la partida en otro tablero
+    def game_moves():
+        'Return the list of moves played, oldest first, in make_move() format'
+        return [entry[0] for entry in history]
+
+
+    # Generador de las jugadas legales, en el formato de make_move()
+    def legal_moves():
+
+        '''
+        Yield the legal moves of the current player, as accepted by 
+        make_move(): placements while stones remain to be played, 
+        slides of an own stone to an empty square afterwards.
+        Nothing is yielded once the game has ended, drawn or not.
+        '''
+
+        if winner != NO_PLAYER or drawn:
+            return
+
+        # Casillas vacías: las que no están en la máscara de ningún jugador. Recorremos sus bits
+        # de menor a mayor, es decir, fila a fila, sin guardarlos en ninguna lista
+        empty = FULL & ~(masks[0] | masks[1])
+
+        # Fase de colocación: una jugada por casilla vacía
+        if total_stones > 0:
+            while empty:
+                low = empty & -empty
+                yield PLACE_MOVES[low.bit_length() - 1]
+                empty ^= low
+
+        # Fase de movimiento: cada piedra propia puede ir a cualquier casilla vacía
+        else:
+            own = masks[curr_player]
+            while own:
+                low = own & -own
+                slides = SLIDE_MOVES[low.bit_length() - 1]
+                own ^= low
+                free = empty
+                while free:
+                    dst = free & -free
+                    yield slides[dst.bit_length() - 1]
+                    free ^= dst
 
 
     # Función para mover las piedras dado unas coordenadas "i" y "j"
@@ -156,11 +355,11 @@ def set_board_up(stones_per_player = 4):
         
         Return 3 values: bool indicating whether a stone is
         already selected, current player, and boolean indicating
-        the end of the game.
+        the end of the game (DRAW if the game is drawn).
         '''
 
-        # Hacemos que las variables curr_player, stone_selected, total_stones y stone_itself sean nonlocal
-        nonlocal curr_player, stone_selected, total_stones, stone_itself
+        # Hacemos que las variables stone_selected y total_stones sean nonlocal
+        nonlocal stone_selected, total_stones
 
         # Obtenemos las coordenadas "x" e "y" de la piedra seleccionada. Esto solo tendrá sentido una vez 
         # después de llamar a la función select_st(). Si no se ha llamado select_st(), "x" e "y" son "None"
@@ -169,12 +368,12 @@ def set_board_up(stones_per_player = 4):
         # Nos aseguramos que las coordenadas seleccionadas por el jugador estén dentro del rango del tablero
         if not(0 <= i < BSIZ and 0 <= j < BSIZ): 
             print("Las coordenadas que has introducido están mal.")
-            return True, curr_player, end()
+            return True, curr_player, game_over()
         
         # Nos aseguramos que la casilla escogida esté vacía
         if board[i][j] != " ": 
             print("Ya hay una ficha en esas coordenadas")
-            return True, curr_player, end()
+            return True, curr_player, game_over()
 
         # Si ninguna de las anteriores condiciones fueron ciertas, entonces, movemos la piedra del jugador 
         # actual a las coordenadas "i" y "j" que haya introducido
@@ -184,45 +383,75 @@ def set_board_up(stones_per_player = 4):
             # Vemos si ha seleccionado alguna piedra o no en la función select_st()
             if x != None and y != None: 
 
-                # Eliminamos la piedra seleccionada por el jugador de la lista played_stones
-                played_stones.remove(Stone(x, y, PLAYER_COLOR[curr_player]))
+                # Anulamos la selección: select_st() había sumado una piedra disponible y make_move() 
+                # no la descuenta al mover una piedra ya jugada
+                total_stones -= 1
+                stone_selected = False
+                make_move(((x, y), (i, j)))
 
-                # Hacemos que la casilla donde estaba la piedra seleccionada por el jugador esté vacía otra vez 
-                board[x][y] = " "  
+            # Si no, colocamos una piedra nueva
+            else:
+                make_move((None, (i, j)))
 
-            # Vemos si es el turno del jugador 1
-            if curr_player == 0: 
+            # Una jugada nueva invalida las jugadas deshechas que se podían rehacer
+            redo_stack.clear()
 
-                # Imprimos una 'X' en la casilla donde quiere mover la piedra el jugador 1
-                board[i][j] = 'X'
+        # Return 3 values: bool indicating whether a stone is already selected, current player, and boolean indicating the end of the game. 
+        return stone_selected, curr_player, game_over()
 
-            # Vemos si es el turno del jugador 2
-            elif curr_player == 1: 
 
-                # Imprimos una 'O' en la casilla donde quiere mover la piedra el jugador 2
-                board[i][j] = 'O'
+    # Deshace la última jugada (para el botón de deshacer de la interfaz)
+    def undo():
 
-            # Añadimos la piedra jugada por el jugador actual en la lista played_stones
-            played_stones.append(Stone(i, j, PLAYER_COLOR[curr_player]))
+        '''
+        Take back the last move, dropping the stone selection if any.
+        Return the same 3 values as move_st().
+        '''
 
-            # Cambiamos de jugador actual
-            curr_player = 1 - curr_player
+        nonlocal stone_selected, total_stones
 
-            # Restamos -1 a la variable 'total_stones' para saber las piedras que aun están disponibles
+        # Si ya se había seleccionado una piedra para moverla, primero anulamos la selección
+        if stone_selected and len(played_stones) == 2*stones_per_player and total_stones > 0:
             total_stones -= 1
+            stone_selected = False
+
+        # Deshacemos la jugada y la guardamos para poder rehacerla
+        if history:
+            redo_stack.append(unmake_move())
 
-            # Miramos el total de piedras aun disponibles, si es cero...
-            if total_stones == 0: 
+        return stone_selected, curr_player, game_over()
+
+
+    # Vuelve a hacer la última jugada deshecha con undo()
+    def redo():
+
+        '''
+        Play again the last move taken back by undo().
+        Return the same 3 values as move_st().
+        '''
 
-                # ...entonces stone_selected = False porque ya no hay más piedras que mover por parte de los 
-                # dos jugadores. De esta manera, entraríamos al bucle while donde el jugador actual tendría 
-                # que seleccionar una de sus piedras y moverla
+        nonlocal stone_selected, total_stones
+
+        if redo_stack:
+
+            # Igual que en undo(), una selección pendiente se anula antes de jugar
+            if stone_selected and len(played_stones) == 2*stones_per_player and total_stones > 0:
+                total_stones -= 1
                 stone_selected = False
+            make_move(redo_stack.pop())
 
-        # Return 3 values: bool indicating whether a stone is already selected, current player, and boolean indicating the end of the game. 
-        return stone_selected, curr_player, end()
+        return stone_selected, curr_player, game_over()
     
 
+    # Función para obtener el tablero en texto, en un solo string
+    def txt():
+        'The board in ASCII characters, as draw_txt() prints it'
+
+        # Cada fila es el contenido de sus casillas separado por barras verticales "|", y entre 
+        # fila y fila hay una línea divisoria con guiones
+        return ("\n" + "-" * (BSIZ * 4 - 1) + "\n").join(" " + " | ".join(row) for row in board)
+
+
     # Función para imprimir el tablero
     def draw_txt(end = False):
 
@@ -230,28 +459,18 @@ def set_board_up(stones_per_player = 4):
         Use ASCII characters to draw the board.
         '''
 
-        # Recorre cada fila del tablero
-        for row in range(BSIZ): 
-
-            # Recorre cada columna de la fila actual
-            for col in range(BSIZ): 
-                pass
-
-                # Si no es la última columna, imprime el contenido de la celda seguido de una barra vertical "|"
-                if col < BSIZ - 1: 
-                    print("", board[row][col], "|", end="")
-                    
-                # Si es la última columna, solo imprime el contenido de la celda
-                else: 
-                    print("", board[row][col], end="")
-
-            # Termina la fila actual y pasa a una nueva línea
-            print()
+        # Imprimimos todo el tablero de una vez
+        print(txt())
 
-            # Si no es la última fila, imprime una línea divisoria con guiones para separar las filas
-            if row < BSIZ - 1: 
-                print("-" * (BSIZ * 4 - 1))
 
+    # Con metrics, las funciones se sustituyen por versiones que cuentan y miden sus llamadas. Como
+    # se cambian las variables del cierre, también cuentan las llamadas de move_st() a end(); los bots
+    # reciben el end() original para que sus búsquedas no se mezclen con la partida
+    search_end = end
+    if metrics is not None:
+        stones, select_st, move_st, draw_txt = metrics.board(stones, select_st, move_st, draw_txt)
+        end = metrics.timed('end', end)
 
-    # return these 4 functions to make them available to the main program
-    return stones, select_st, move_st, draw_txt
\ No newline at end of file
+    # return these functions to make them available to the main program and the bots
+    return Engine(stones, select_st, move_st, draw_txt, make_move, unmake_move, undo, redo, legal_moves,
+                  search_end, position, game_moves, txt, is_draw)
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Computer player for the abstract board: iterative-deepening negamax with
+alpha-beta pruning and a transposition table shared by symmetric positions.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ
+from constants import BSIZ
+
+# Tablebase with perfect play for the movement phase (built with python tablebase.py)
+from tablebase import open_tablebase, TB_FILE, DRAW as TB_DRAW, LOSS as TB_LOSS, ILLEGAL
+
+# The 8 symmetries of the square board, shared with the opening book
+from pos_index import SYM
+
+# Opening book with the best placements (built with python opening_book.py)
+from opening_book import set_book_up, BOOK_FILE
+
+import os
+from random import Random
+from time import perf_counter
+
+# Valor de una partida ganada; se le resta la distancia a la victoria para preferir ganar antes
+WIN = 1000
+
+# Por encima de este valor, una puntuación es una victoria (o derrota) a distancia conocida
+WIN_BOUND = WIN - 100
+
+# Tipos de valor guardados en la tabla de transposición
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Números aleatorios de Zobrist (con semilla fija para que los hashes sean reproducibles)
+_rng = Random(BSIZ)
+ZOBRIST = tuple(tuple(_rng.getrandbits(64) for _ in range(BSIZ*BSIZ)) for _ in range(2))
+Z_SIDE = tuple(_rng.getrandbits(64) for _ in range(2))
+Z_LEFT = tuple(_rng.getrandbits(64) for _ in range(BSIZ*BSIZ + 2))
+
+# ZDELTA[p][k][s]: lo que cambia el hash de la simetría s al poner o quitar una piedra de p en k
+ZDELTA = tuple(tuple(tuple(ZOBRIST[p][SYM[s][k]] for s in range(8)) for k in range(BSIZ*BSIZ))
+               for p in range(2))
+
+
+def set_player_up(engine, max_depth = 12, time_limit = 0.5, tt_bits = 16, tb_file = TB_FILE,
+                  book_file = BOOK_FILE):
+    '''Prepare a computer player for the given engine (from abs_board.set_engine_up());
+    return a function that chooses the move, in make_move() format, of the current
+    player. The transposition table of 2**tt_bits entries is kept between calls.
+    If the tablebase file tb_file exists, movement phase moves are read from it;
+    if the opening book book_file exists, placements are read from it.'''
+
+    make_move, unmake_move, legal_moves, end, position = (
+        engine.make_move, engine.unmake_move, engine.legal_moves, engine.end, engine.position)
+
+    # Si existe la tablebase, la fase de movimiento no necesita búsqueda
+    probe = open_tablebase(tb_file) if tb_file is not None and os.path.exists(tb_file) else None
+
+    # El libro de aperturas solo se lee si se llega a consultar
+    book_move = set_book_up(book_file) if book_file is not None else None
+
+    # Tabla de transposición de tamaño fijo: cada hash va a la entrada hash & tt_mask. Una entrada
+    # solo se sustituye por una búsqueda más profunda o si es de una búsqueda anterior (generation)
+    tt_size = 1 << tt_bits
+    tt_mask = tt_size - 1
+    tt_key = [None] * tt_size
+    tt_depth = [0] * tt_size
+    tt_value = [0] * tt_size
+    tt_flag = [EXACT] * tt_size
+    tt_gen = [0] * tt_size
+    generation = 0
+
+    # Hash de la posición actual bajo cada una de las 8 simetrías
+    hashes = [0] * 8
+
+    # Para cortar la búsqueda cuando se acaba el tiempo o cuando nos lo piden: hora límite,
+    # aviso de parada, nodos visitados y jugadas hechas con apply() que aún no se han deshecho
+    deadline = 0.0
+    stop_event = None
+    nodes = 0
+    pending = 0
+
+    class _Timeout(Exception):
+        pass
+
+
+    def apply(move, player):
+        'Play move for player and update the 8 hashes'
+
+        nonlocal pending
+
+        pending += 1
+        src, dst = move
+        delta = ZDELTA[player][dst[0]*BSIZ + dst[1]]
+        if src is not None:
+            back = ZDELTA[player][src[0]*BSIZ + src[1]]
+            for s in range(8):
+                hashes[s] ^= delta[s] ^ back[s]
+        else:
+            for s in range(8):
+                hashes[s] ^= delta[s]
+        make_move(move)
+
+
+    def revert(move, player):
+        'Undo move of player and restore the 8 hashes'
+
+        nonlocal pending
+
+        pending -= 1
+        unmake_move()
+        src, dst = move
+        delta = ZDELTA[player][dst[0]*BSIZ + dst[1]]
+        if src is not None:
+            back = ZDELTA[player][src[0]*BSIZ + src[1]]
+            for s in range(8):
+                hashes[s] ^= delta[s] ^ back[s]
+        else:
+            for s in range(8):
+                hashes[s] ^= delta[s]
+
+
+    def negamax(depth, alpha, beta, ply, player, left):
+        'Value of the position for player, who is about to move'
+
+        nonlocal nodes
+
+        nodes += 1
+        if nodes & 1023 == 0 and (perf_counter() > deadline or
+                                  stop_event is not None and stop_event.is_set()):
+            raise _Timeout
+
+        if depth == 0:
+            return 0
+
+        # Las posiciones simétricas comparten entrada: usamos el menor de los 8 hashes
+        key = min(hashes) ^ Z_SIDE[player] ^ Z_LEFT[left]
+        idx = key & tt_mask
+        if tt_key[idx] == key and tt_depth[idx] >= depth:
+            value = tt_value[idx]
+            if value > WIN_BOUND:
+                value -= ply
+            elif value < -WIN_BOUND:
+                value += ply
+            flag = tt_flag[idx]
+            if flag == EXACT:
+                return value
+            if flag == LOWER and value >= beta:
+                return value
+            if flag == UPPER and value <= alpha:
+                return value
+
+        alpha_orig = alpha
+        best = -WIN
+        child_left = left - 1 if left > 0 else 0
+        for move in legal_moves():
+            apply(move, player)
+            if end():
+                value = WIN - ply - 1
+            else:
+                value = -negamax(depth - 1, -beta, -alpha, ply + 1, 1 - player,
+                                 child_left if move[0] is None else left)
+            revert(move, player)
+            if value > best:
+                best = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        # Sin jugadas posibles no hay ganador: tablas
+        if best == -WIN:
+            best = 0
+
+        # Guardamos el resultado; las victorias se guardan a distancia desde esta posición
+        if tt_key[idx] != key and tt_gen[idx] == generation and tt_depth[idx] > depth:
+            return best
+        stored = best + ply if best > WIN_BOUND else best - ply if best < -WIN_BOUND else best
+        tt_key[idx] = key
+        tt_depth[idx] = depth
+        tt_value[idx] = stored
+        tt_gen[idx] = generation
+        tt_flag[idx] = UPPER if best <= alpha_orig else LOWER if best >= beta else EXACT
+        return best
+
+
+    def tablebase_move(moves):
+        'Best move according to the tablebase, or None if it does not cover the position'
+
+        best_move, best_rank = None, None
+        for move in moves:
+            make_move(move)
+            result, dist = probe(*position()[:3])
+            unmake_move()
+            if result == ILLEGAL:
+                return None
+
+            # Mejor dejar al rival perdido cuanto antes; si no, tablas; si no, perder lo más tarde posible
+            rank = (2, -dist) if result == TB_LOSS else (1, 0) if result == TB_DRAW else (0, dist)
+            if best_rank is None or rank > best_rank:
+                best_move, best_rank = move, rank
+        return best_move
+
+
+    def choose_move(stop = None):
+
+        '''
+        Return the move chosen for the current player, or None if there is none.
+        Search deeper and deeper until max_depth or until time_limit seconds pass,
+        or until stop (a threading.Event, for searches in another thread) is set.
+        '''
+
+        nonlocal generation, deadline, stop_event, nodes, pending
+
+        mask0, mask1, player, left = position()
+        moves = list(legal_moves())
+        if not moves:
+            return None
+
+        if probe is not None and left == 0:
+            move = tablebase_move(moves)
+            if move is not None:
+                return move
+
+        if book_move is not None and left > 0:
+            move = book_move(mask0, mask1, player, left)
+            if move is not None:
+                return move
+
+        # Hashes de la posición de partida bajo cada simetría
+        for s in range(8):
+            hashes[s] = 0
+            for k in range(BSIZ*BSIZ):
+                if mask0 >> k & 1:
+                    hashes[s] ^= ZDELTA[0][k][s]
+                elif mask1 >> k & 1:
+                    hashes[s] ^= ZDELTA[1][k][s]
+
+        generation += 1
+        deadline = perf_counter() + time_limit
+        stop_event = stop
+        nodes = 0
+        pending = 0
+        best_move = moves[0]
+
+        for depth in range(1, max_depth + 1):
+            try:
+                best_value = -WIN - 1
+                alpha = -WIN - 1
+                for move in moves:
+                    apply(move, player)
+                    if end():
+                        value = WIN - 1
+                    else:
+                        value = -negamax(depth - 1, -WIN - 1, -alpha, 1, 1 - player,
+                                         left - 1 if move[0] is None else left)
+                    revert(move, player)
+                    if value > best_value:
+                        best_value, iter_move = value, move
+                        alpha = max(alpha, value)
+            except _Timeout:
+
+                # La búsqueda ha quedado a medias: deshacemos las jugadas pendientes
+                # y nos quedamos con la mejor jugada de la profundidad anterior
+                for _ in range(pending):
+                    unmake_move()
+                break
+
+            # Probamos primero la mejor jugada en la siguiente iteración
+            best_move = iter_move
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+
+            # Si ya sabemos el resultado exacto no hace falta buscar más
+            if abs(best_value) > WIN_BOUND:
+                break
+
+        return best_move
+
+
+    return choose_move
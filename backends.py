@@ -0,0 +1,98 @@
+"""
+Registry of the board implementations. Every backend provides
+set_board_up(stones_per_player) returning the same 4 functions:
+  stones()         iterable with the stones already played,
+  select_st(i, j)  select a stone of the current player, report success,
+  move_st(i, j)    move or place the selected stone, return: bool "stone
+                   still selected", next player and end of game (True, False
+                   or DRAW),
+  draw_txt(end)    print the board in ASCII characters,
+so the main programs can play on any of them.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import initialization of the abstract board, which follows the game for the computer player
+from abs_board import set_engine_up
+
+import importlib
+
+# Backends conocidos: nombre -> módulo con set_board_up(), que solo se importa cuando se usa
+BACKENDS = {
+    'abs_board': 'abs_board',
+    'bit_board': 'bit_board',
+    'board': 'board',
+    'diccionaris': 'diccionaris',
+}
+DEFAULT_BACKEND = 'abs_board'
+
+# Funciones set_board_up() ya cargadas o registradas con register()
+_loaded = {}
+
+
+def register(name, set_board_up):
+    'Add a backend given its set_board_up() function, or replace the one with that name'
+    BACKENDS[name] = set_board_up.__module__
+    _loaded[name] = set_board_up
+
+
+def get_backend(name = DEFAULT_BACKEND):
+    'The set_board_up() function of backend name'
+    if name not in _loaded:
+        if name not in BACKENDS:
+            raise ValueError("unknown backend " + repr(name) + ", expected one of " + ", ".join(BACKENDS))
+        _loaded[name] = importlib.import_module(BACKENDS[name]).set_board_up
+    return _loaded[name]
+
+
+def mirrored(engine, select_st, move_st):
+    '''Wrap select_st() and move_st() of a backend so that every move it
+    accepts is also played on engine (from abs_board.set_engine_up()),
+    which the computer player needs; return the 2 wrapped functions.'''
+
+    # Última piedra seleccionada, origen de la próxima jugada en la fase de movimiento
+    selected = None
+
+    def select(i, j):
+        nonlocal selected
+        if select_st(i, j):
+            selected = (i, j)
+            return True
+        return False
+
+    def move(i, j):
+        nonlocal selected
+        _, _, player, left = engine.position()
+        result = move_st(i, j)
+        if result[1] != player:
+            engine.make_move((selected if left == 0 else None, (i, j)))
+            selected = None
+        return result
+
+    return select, move
+
+
+def board_up(name = DEFAULT_BACKEND, stones_per_player = 4, metrics = None):
+    '''The 4 functions of a new board of backend name, measured by metrics
+    (a metrics.Metrics object) if given: end() too on abs_board.'''
+    if name == 'abs_board':
+        return set_engine_up(stones_per_player, metrics = metrics)[:4]
+    functions = get_backend(name)(stones_per_player)
+    return metrics.board(*functions) if metrics is not None else functions
+
+
+def set_game_up(name = DEFAULT_BACKEND, stones_per_player = 4, metrics = None):
+
+    '''
+    Prepare a game on backend name. Return an engine from
+    abs_board.set_engine_up() that follows the game, for the computer
+    player, and the 4 functions of the backend. With a metrics.Metrics
+    object the 4 functions are measured (and end(), on abs_board).
+    '''
+
+    if name == 'abs_board':
+        engine = set_engine_up(stones_per_player, metrics = metrics)
+        return (engine,) + tuple(engine[:4])
+    engine = set_engine_up(stones_per_player)
+    stones, select_st, move_st, draw_txt = board_up(name, stones_per_player, metrics)
+    select_st, move_st = mirrored(engine, select_st, move_st)
+    return engine, stones, select_st, move_st, draw_txt
@@ -0,0 +1,120 @@
+"""
+Headless board for many games at once: N games are kept in one NumPy
+array of shape (N, BSIZ, BSIZ) and each call moves in all of them, with
+the end of the game checked for the whole batch with line sums.
+Usage: python batch_board.py [number of games]
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, stones in a row to win KROW, stones per player ST_PLAYER, NO_PLAYER
+from constants import BSIZ, KROW, ST_PLAYER, NO_PLAYER
+
+# Winning lines, the same ones used by abs_board
+from abs_board import WINDOWS
+
+import numpy as np
+
+# Contenido de las casillas: 0 vacía, +1 piedra del jugador 0, -1 piedra del jugador 1.
+# Así una línea es de un jugador cuando su suma vale KROW o -KROW
+EMPTY = 0
+SIGN = np.array((1, -1), dtype = np.int8)
+
+# Casillas de cada línea ganadora como columnas de la vista plana de los tableros
+WINDOW_CELLS = np.array([[i*BSIZ + j for i, j in cells] for cells in WINDOWS], dtype = np.intp)
+
+
+def set_batch_up(n_games, stones_per_player = ST_PLAYER):
+
+    '''
+    Init n_games boards, prepare functions to provide, act as their closure.
+    Return the array of boards and 3 functions: move_batch, random_moves
+    and rollout.
+    '''
+
+    boards = np.zeros((n_games, BSIZ, BSIZ), dtype = np.int8)
+
+    # Vista plana de los tableros: la casilla (i, j) es la columna i*BSIZ + j
+    cells = boards.reshape(n_games, BSIZ*BSIZ)
+
+    # Estado de cada partida: jugador actual, piedras por colocar y ganador (NO_PLAYER si no ha acabado)
+    curr_player = np.zeros(n_games, dtype = np.int8)
+    total_stones = np.full(n_games, 2*stones_per_player, dtype = np.int16)
+    winner = np.full(n_games, NO_PLAYER, dtype = np.int8)
+
+    games = np.arange(n_games)
+
+
+    def check_end():
+        'Update winner for the whole batch from the sums of every line'
+
+        sums = cells[:, WINDOW_CELLS].sum(axis = 2, dtype = np.int16)
+        running = winner == NO_PLAYER
+        winner[running & (sums == KROW).any(axis = 1)] = 0
+        winner[running & (sums == -KROW).any(axis = 1)] = 1
+
+
+    def move_batch(src, dst):
+
+        '''
+        Play one move in every unfinished game: src and dst are arrays of
+        n_games square numbers i*BSIZ + j, src being -1 to place a new stone.
+        Illegal moves are ignored.
+        Return 3 arrays: move accepted, current player and winner (NO_PLAYER
+        while the game goes on).
+        '''
+
+        sign = SIGN[curr_player]
+        placing = total_stones > 0
+
+        # Una jugada es legal si el destino está vacío y, en la fase de movimiento,
+        # el origen es una piedra del jugador actual
+        ok = (winner == NO_PLAYER) & (cells[games, dst] == EMPTY)
+        ok &= np.where(placing, src < 0, cells[games, np.maximum(src, 0)] == sign)
+
+        moving = ok & ~placing
+        cells[games[moving], src[moving]] = EMPTY
+        cells[games[ok], dst[ok]] = sign[ok]
+
+        total_stones[ok & placing] -= 1
+        curr_player[ok] ^= 1
+        check_end()
+        return ok, curr_player, winner
+
+
+    def random_moves(rng):
+        'Random legal move (src, dst) for every game, as move_batch() takes them'
+
+        # Para elegir al azar entre ciertas casillas, les damos una puntuación aleatoria
+        # y nos quedamos con la de más puntuación
+        noise = rng.random(cells.shape)
+        dst = np.where(cells == EMPTY, noise, -1.0).argmax(axis = 1)
+        noise = rng.random(cells.shape)
+        own = cells == SIGN[curr_player][:, None]
+        src = np.where(total_stones > 0, -1, np.where(own, noise, -1.0).argmax(axis = 1))
+        return src, dst
+
+
+    def rollout(rng, max_plies = 200):
+        'Play random moves until every game ends or max_plies; return the winners'
+
+        for _ in range(max_plies):
+            if (winner != NO_PLAYER).all():
+                break
+            move_batch(*random_moves(rng))
+        return winner
+
+
+    return boards, move_batch, random_moves, rollout
+
+
+if __name__ == '__main__':
+    import sys
+    from time import perf_counter
+
+    n_games = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    boards, move_batch, random_moves, rollout = set_batch_up(n_games)
+    start = perf_counter()
+    winner = rollout(np.random.default_rng(0))
+    elapsed = perf_counter() - start
+    print(n_games, "games in", round(elapsed, 3), "s:", round(n_games / elapsed), "games/s")
+    print("wins:", (winner == 0).sum(), (winner == 1).sum(), "unfinished:", (winner == NO_PLAYER).sum())
@@ -0,0 +1,162 @@
+"""
+Bitboard version of the abstract board for simple tic-tac-toe-like games.
+Same closure API as abs_board.set_board_up(): stones, select_st, move_st, draw_txt.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import:
+# color PLAYER_COLOR; board dimension BSIZ; DRAW; draw rules MAX_MOVES, REPETITIONS
+from constants import PLAYER_COLOR, BSIZ, DRAW, MAX_MOVES, REPETITIONS
+
+# Data structure for stones, bit of each square (i, j) and winning lines, the same ones used by abs_board
+from abs_board import Stone, BIT, WINDOWS, LINES_THROUGH
+
+# Máscaras precalculadas de las líneas ganadoras: KROW casillas seguidas en cualquier dirección
+LINES = tuple(sum(BIT[i][j] for i, j in cells) for cells in WINDOWS)
+
+# Máscaras de las líneas que pasan por cada casilla (i, j), las únicas que puede completar una piedra allí
+MASKS_THROUGH = tuple(tuple(tuple(LINES[line] for line in lines) for lines in row) for row in LINES_THROUGH)
+
+# Símbolo de cada jugador al dibujar el tablero
+MARK = ('X', 'O')
+
+
+def set_board_up(stones_per_player = 4, max_moves = MAX_MOVES, repetitions = REPETITIONS):
+    '''Init stones and board, prepare functions to provide, act as their closure.
+    Draws as in abs_board.set_engine_up().'''
+
+    # Una máscara por jugador: el bit de la casilla (i, j) está a 1 si el jugador tiene una piedra allí
+    masks = [0, 0]
+
+    # Para saber a qué jugador le toca // 0 --> Jugador 1 ('X') y 1 --> Jugador 2 ('O')
+    curr_player = 0
+
+    # Para saber si se ha seleccionado una piedra o no
+    stone_selected = True
+
+    # El número total de piedras disponibles entre los dos jugadores
+    total_stones = stones_per_player * 2
+
+    # Coordenadas de la piedra seleccionada. De momento no hay ninguna piedra seleccionada.
+    stone_itself = (None, None)
+
+    # Si algún jugador ya ha completado una línea
+    won = False
+
+    # Veces que ha aparecido cada posición (las dos máscaras y el jugador que mueve, en un entero),
+    # jugadas hechas y si la partida ha acabado en tablas
+    seen = {}
+    moves = 0
+    drawn = False
+
+
+    def stones():
+        "return iterable with the stones already played"
+
+        # Construimos las piedras a partir de las máscaras solo cuando se piden,
+        # así move_st no tiene que mantener ninguna lista
+        return [Stone(i, j, PLAYER_COLOR[p])
+                for p in (0, 1) for i in range(BSIZ) for j in range(BSIZ)
+                if masks[p] & BIT[i][j]]
+
+
+    def select_st(i, j):
+
+        '''
+        Select stone that current player intends to move.
+        Player must select a stone of his own.
+        To be called only after all stones played.
+        Report success by returning a boolean;
+        '''
+
+        nonlocal total_stones, stone_itself, stone_selected
+
+        # La casilla tiene que estar dentro del tablero y contener una piedra del jugador actual
+        if 0 <= i < BSIZ and 0 <= j < BSIZ and masks[curr_player] & BIT[i][j]:
+            stone_itself = (i, j)
+            total_stones += 1
+            stone_selected = True
+            return True
+
+        return False
+
+
+    def end():
+        'Test whether there are KROW aligned stones'
+
+        # move_st() ya ha mirado las líneas que pasan por la casilla de la última piedra
+        return won
+
+
+    def move_st(i, j):
+
+        '''If valid square, move there selected stone and unselect it,
+        then check for end of game, then select new stone for next
+        player unless all stones already played; if square not valid,
+        do nothing and keep selected stone.
+
+        Return 3 values: bool indicating whether a stone is
+        already selected, current player, and boolean indicating
+        the end of the game (DRAW if the game is drawn).
+        '''
+
+        nonlocal curr_player, stone_selected, total_stones, moves, drawn, won
+
+        # La casilla tiene que estar dentro del tablero y vacía; si no, como abs_board, se
+        # contesta que hay piedra seleccionada aunque no se haya llamado a select_st()
+        if not (0 <= i < BSIZ and 0 <= j < BSIZ) or (masks[0] | masks[1]) & BIT[i][j]:
+            return True, curr_player, DRAW if drawn else end()
+
+        if stone_selected:
+
+            # Si se ha seleccionado una piedra con select_st(), la quitamos de su casilla
+            x, y = stone_itself
+            if x is not None and y is not None:
+                masks[curr_player] &= ~BIT[x][y]
+
+            # Colocamos la piedra del jugador actual en la casilla (i, j); una línea está completa
+            # si todos sus bits están en la máscara del jugador
+            masks[curr_player] |= BIT[i][j]
+            own = masks[curr_player]
+            for line in MASKS_THROUGH[i][j]:
+                if own & line == line:
+                    won = True
+
+            # Cambiamos de jugador actual y descontamos la piedra jugada
+            curr_player = 1 - curr_player
+            total_stones -= 1
+
+            # Si ya no quedan piedras por colocar, el siguiente jugador tendrá que seleccionar una
+            if total_stones == 0:
+                stone_selected = False
+
+            # Tablas si la posición se repite demasiadas veces o la partida es demasiado larga
+            moves += 1
+            key = masks[0] | masks[1] << BSIZ*BSIZ | curr_player << 2*BSIZ*BSIZ
+            seen[key] = seen.get(key, 0) + 1
+            if not end() and (seen[key] >= repetitions or max_moves is not None and moves >= max_moves):
+                drawn = True
+
+        return stone_selected, curr_player, DRAW if drawn else end()
+
+
+    def draw_txt(end = False):
+
+        '''
+        Use ASCII characters to draw the board.
+        '''
+
+        for row in range(BSIZ):
+
+            # Contenido de cada casilla de la fila: 'X', 'O' o vacía
+            cells = (MARK[0] if masks[0] & BIT[row][col] else MARK[1] if masks[1] & BIT[row][col] else " "
+                     for col in range(BSIZ))
+            print("", " | ".join(cells))
+
+            # Si no es la última fila, imprime una línea divisoria con guiones para separar las filas
+            if row < BSIZ - 1:
+                print("-" * (BSIZ * 4 - 1))
+
+
+    # return these 4 functions to make them available to the main program
+    return stones, select_st, move_st, draw_txt
@@ -0,0 +1,172 @@
+"""
+Object-oriented version of the abstract board: a Board keeps a whole game
+in a few slots and two bytearrays, so it is small, cheap to copy and can
+be pickled. set_board_up() adapts it to the usual four-function API.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: color PLAYER_COLOR; board dimension BSIZ, stones in a row to win KROW; NO_PLAYER, DRAW;
+# draw rules MAX_MOVES, REPETITIONS
+from constants import PLAYER_COLOR, BSIZ, KROW, NO_PLAYER, DRAW, MAX_MOVES, REPETITIONS
+
+# Data structure for stones, symbols of the players and lines through each square
+from abs_board import Stone, MARK, N_LINES, LINES_THROUGH
+
+# Contenido de las casillas: 0 vacía, 1 + jugador si hay una piedra
+EMPTY = 0
+
+
+class Board:
+    'State of a game, with the same operations as the functions of set_board_up()'
+
+    __slots__ = ('cells', 'line_count', 'curr_player', 'stone_selected', 'total_stones',
+                 'stone_itself', 'winner', 'seen', 'moves', 'drawn', 'max_moves', 'repetitions')
+
+    def __init__(self, stones_per_player = 4, max_moves = MAX_MOVES, repetitions = REPETITIONS):
+
+        # Casilla (i, j) en la posición i*BSIZ + j
+        self.cells = bytearray(BSIZ * BSIZ)
+
+        # Piedras de cada jugador en cada línea: la línea l del jugador p está en p*N_LINES + l
+        self.line_count = bytearray(2 * N_LINES)
+
+        self.curr_player = 0
+        self.stone_selected = True
+        self.total_stones = stones_per_player * 2
+
+        # Casilla de la piedra seleccionada, o -1 si no hay ninguna
+        self.stone_itself = -1
+        self.winner = NO_PLAYER
+
+        # Veces que ha aparecido cada posición (casillas y jugador que mueve) y jugadas hechas,
+        # para declarar tablas como abs_board
+        self.seen = {}
+        self.moves = 0
+        self.drawn = False
+        self.max_moves = max_moves
+        self.repetitions = repetitions
+
+    def copy(self):
+        'Independent copy of the game'
+        other = Board.__new__(Board)
+        other.cells = bytearray(self.cells)
+        other.line_count = bytearray(self.line_count)
+        other.curr_player = self.curr_player
+        other.stone_selected = self.stone_selected
+        other.total_stones = self.total_stones
+        other.stone_itself = self.stone_itself
+        other.winner = self.winner
+        other.seen = dict(self.seen)
+        other.moves = self.moves
+        other.drawn = self.drawn
+        other.max_moves = self.max_moves
+        other.repetitions = self.repetitions
+        return other
+
+    def stones(self):
+        "return iterable with the stones already played"
+        cells = self.cells
+        return [Stone(k // BSIZ, k % BSIZ, PLAYER_COLOR[cells[k] - 1])
+                for k in range(BSIZ * BSIZ) if cells[k] != EMPTY]
+
+    def select_st(self, i, j):
+
+        '''
+        Select stone that current player intends to move.
+        Player must select a stone of his own.
+        To be called only after all stones played.
+        Report success by returning a boolean;
+        '''
+
+        if 0 <= i < BSIZ and 0 <= j < BSIZ and self.cells[i*BSIZ + j] == self.curr_player + 1:
+            self.stone_itself = i*BSIZ + j
+            self.total_stones += 1
+            self.stone_selected = True
+            return True
+        return False
+
+    def end(self):
+        'Test whether there are KROW aligned stones'
+        return self.winner != NO_PLAYER
+
+    def is_draw(self):
+        'Test whether the game has ended in a draw'
+        return self.drawn
+
+    def game_over(self):
+        'End of game value returned by move_st()'
+        return DRAW if self.drawn else self.winner != NO_PLAYER
+
+    def move_st(self, i, j):
+
+        '''If valid square, move there selected stone and unselect it,
+        then check for end of game, then select new stone for next
+        player unless all stones already played; if square not valid,
+        do nothing and keep selected stone.
+
+        Return 3 values: bool indicating whether a stone is
+        already selected, current player, and boolean indicating
+        the end of the game (DRAW if the game is drawn).
+        '''
+
+        cells, line_count = self.cells, self.line_count
+        player = self.curr_player
+
+        # La casilla tiene que estar dentro del tablero y vacía; si no, como abs_board, se
+        # contesta que hay piedra seleccionada aunque no se haya llamado a select_st()
+        if not (0 <= i < BSIZ and 0 <= j < BSIZ) or cells[i*BSIZ + j] != EMPTY:
+            return True, player, self.game_over()
+
+        if self.stone_selected:
+            base = player * N_LINES
+
+            # Si se ha seleccionado una piedra con select_st(), la quitamos de su casilla
+            if self.stone_itself >= 0:
+                x, y = divmod(self.stone_itself, BSIZ)
+                cells[self.stone_itself] = EMPTY
+                for line in LINES_THROUGH[x][y]:
+                    line_count[base + line] -= 1
+
+            # Colocamos la piedra y miramos si completa alguna línea
+            cells[i*BSIZ + j] = player + 1
+            for line in LINES_THROUGH[i][j]:
+                line_count[base + line] += 1
+                if line_count[base + line] == KROW:
+                    self.winner = player
+
+            self.curr_player = 1 - player
+            self.total_stones -= 1
+            if self.total_stones == 0:
+                self.stone_selected = False
+
+            # Tablas si la posición se repite demasiadas veces o la partida es demasiado larga
+            self.moves += 1
+            key = bytes(cells) + bytes((self.curr_player,))
+            count = self.seen.get(key, 0) + 1
+            self.seen[key] = count
+            if self.winner == NO_PLAYER and (count >= self.repetitions or
+                                             self.max_moves is not None and self.moves >= self.max_moves):
+                self.drawn = True
+
+        return self.stone_selected, self.curr_player, self.game_over()
+
+    def txt(self):
+        'The board in ASCII characters, as draw_txt() prints it'
+        symbol = (" ",) + MARK
+        rows = (" " + " | ".join(symbol[self.cells[row*BSIZ + col]] for col in range(BSIZ))
+                for row in range(BSIZ))
+        return ("\n" + "-" * (BSIZ * 4 - 1) + "\n").join(rows)
+
+    def draw_txt(self, end = False):
+
+        '''
+        Use ASCII characters to draw the board.
+        '''
+
+        print(self.txt())
+
+
+def set_board_up(stones_per_player = 4, max_moves = MAX_MOVES, repetitions = REPETITIONS):
+    'Init a Board and return its 4 functions, as abs_board.set_board_up() does'
+    board = Board(stones_per_player, max_moves, repetitions)
+    return board.stones, board.select_st, board.move_st, board.draw_txt
@@ -3,6 +3,11 @@ BSIZ = 3 # board side size
 
 ST_PLAYER = 4 # stones per player
 
+KROW = BSIZ # stones in a row (horizontal, vertical or diagonal) needed to win
+
+MAX_MOVES = 200  # moves after which a game is a draw (None for no limit)
+REPETITIONS = 3  # times the same position must appear for a draw
+
 # Define the colors we will use in RGB format
 BLACK =   (  0,   0,   0)
 GRAY =    (150, 150, 150) 
@@ -13,11 +18,12 @@ REDDISH = (212,  17,  89)
 PLAYER_COLOR = (BLUISH, REDDISH) 
 
 # Define the game window width and height and the slot size and separation in pixels
-SLOT = 100        # squares size
-SEP = 20          # squares separation
+SLOT = 300 // BSIZ # squares size: the board takes about the same room whatever BSIZ
+SEP = SLOT // 5    # squares separation
 ROOM = SLOT + SEP # extra room at sides 
-HEIGHT = BSIZ * SLOT + (BSIZ + 1) * SEP + ROOM # room for 3 squares with margin and internal separators and extra below
+HEIGHT = BSIZ * SLOT + (BSIZ + 1) * SEP + ROOM # room for BSIZ squares with margin and internal separators and extra below
 WIDTH = HEIGHT + ROOM              # extra at both sides
 RAD = SLOT / 3                     # circle radius
 
 NO_PLAYER = -1
+DRAW = 2 # end of game value returned by move_st() when the game is drawn
@@ -8,9 +8,12 @@ I would prefer to do everything in terms of object-oriented programming though.
 """
 
 # Import: 
-# color GRAY; PLAYER_COLOR, NO_PLAYER
-# board dimension BSIZ
-from constants import PLAYER_COLOR, BSIZ, NO_PLAYER, GRAY
+# color GRAY; PLAYER_COLOR, NO_PLAYER, DRAW
+# board dimension BSIZ; draw rules MAX_MOVES, REPETITIONS
+from constants import PLAYER_COLOR, BSIZ, NO_PLAYER, DRAW, GRAY, MAX_MOVES, REPETITIONS
+
+# Winning lines of KROW squares and the ones through each square, the same ones used by abs_board
+from abs_board import WINDOWS, LINES_THROUGH
 
 # Data structure for stones
 from collections import namedtuple
@@ -19,8 +22,9 @@ from collections import namedtuple
 Stone = namedtuple('Stone', ('x', 'y', 'color'))
 
 
-def set_board_up(stones_per_player=4):
-    'Init stones and board, prepare functions to provide, act as their closure'
+def set_board_up(stones_per_player=4, max_moves=MAX_MOVES, repetitions=REPETITIONS):
+    '''Init stones and board, prepare functions to provide, act as their closure.
+    Draws as in abs_board.set_engine_up().'''
 
     # init board and game data here
 
@@ -31,7 +35,11 @@ def set_board_up(stones_per_player=4):
         'curr_player': 0,            # Jugador actual ("0" es el jugador 1 o "1" es el jugador 2). Las fichas del jugador 1 serán 'X' y 'O' del jugador 2
         'stone_selected': True,      # Para saber si se ha seleccionado una piedra o no después de que los dos jugadores hayan movido todas sus piedras disponibles
         'total_stones': stones_per_player * 2,  # Total de piedras disponibles entre los dos jugadores
-        'stone_itself': (None, None)  # Coordenadas de la piedra seleccionada
+        'stone_itself': (None, None),  # Coordenadas de la piedra seleccionada
+        'seen': {},                  # Veces que ha aparecido cada posición (tablero y jugador que mueve)
+        'moves': 0,                  # Jugadas hechas
+        'drawn': False,              # Si la partida ha acabado en tablas por repetición o por límite de jugadas
+        'won': False                 # Si el último jugador en mover ha hecho KROW en raya
     }
 
     def stones():
@@ -91,53 +99,14 @@ def set_board_up(stones_per_player=4):
             
             return False
 
-    # Función para comprobar si los jugadores han hecho '' en raya horizontalmente, verticalmente o diagonalmente
+    # Función para comprobar si los jugadores han hecho KROW en raya horizontalmente, verticalmente o diagonalmente
     def end():
 
-        'Test whether there are 3 aligned stones'
-
-        # Guardamos el valor de la clave 'board' en la variable board 
-        board = state['board']
-
-        # Comprobar por filas
-        for i in range(BSIZ):
-
-            # Comprobamos si la primera piedra de la fila 'i' ([board[i][0]]) es igual que los otros elementos que 
-            # también están en la misma fila (board[i][j]). Además, nos aseguramos que las casillas que estamos
-            # comprobando no sea vacía (board[i][j] != " ").            
-            if all(board[i][j] == board[i][0] and board[i][j] != NO_PLAYER for j in range(BSIZ)):
-                
-                # Retornamos True si alguna de las filas cumple lo anteriormente dicho
-                return True
-
-        # Comprobar por columnas
-        for j in range(BSIZ):
-
-            # Comprobamos si la primera piedra de la columna 'j' ([board[0][j]]) es igual que los otros elementos que 
-            # también están en la misma columna (board[i][j]). 
-            if all(board[i][j] == board[0][j] and board[i][j] != NO_PLAYER for i in range(BSIZ)):
-                
-                # Retornamos True si alguna de las columnas cumple lo anteriormente dicho
-                return True
-
-        # Comprobar por la diagonal principal:
-        # Comprobamos si la piedra que se encuentra en la primera fila y columna (board[0][0]) es igual que los demás
-        # piedras que se encuentran en la diagonal principal (board[i][i])
-        if all(board[i][i] == board[0][0] and board[i][i] != NO_PLAYER for i in range(BSIZ)):
-            
-            # Retornamos True si la diagonal principal cumple lo anteriormente dicho
-            return True
-
-        # Comprobar por la diagonal secundaria
-        # Comprobamos si la piedra que se encuentra en la primera fila y última columna (board[0][BSIZ-1]) es igual 
-        # que los demás piedras que se encuentran en la diagonal secundaria (board[i][BSIZ - 1 - i])
-        if all(board[i][BSIZ - 1 - i] == board[0][BSIZ - 1] and board[i][BSIZ - 1 - i] != NO_PLAYER for i in range(BSIZ)):
-            
-            # Retornamos True si la diagonal secundaria cumple lo anteriormente dicho
-            return True
+        'Test whether there are KROW aligned stones'
 
-        # Si ninguna de las condiciones anteriores fueron ciertas, quiere decir que el juego aún no ha acabado
-        return False
+        # No hace falta recorrer el tablero: move_st() ya ha mirado las líneas que pasan
+        # por la casilla donde se ha colocado la última piedra
+        return state['won']
 
 
      # Función para mover las piedras dado unas coordenadas "i" y "j"
@@ -150,7 +119,7 @@ def set_board_up(stones_per_player=4):
         
         Return 3 values: bool indicating whether a stone is
         already selected, current player, and boolean indicating
-        the end of the game.
+        the end of the game (DRAW if the game is drawn).
         '''
 
         # Guardamos los valores de las claves en variables con el mismo nombre que la clave 
@@ -166,12 +135,10 @@ def set_board_up(stones_per_player=4):
         x, y = stone_itself
 
         # Nos aseguramos que las coordenadas seleccionadas por el jugador estén dentro del rango del tablero
+        # y que la casilla escogida esté vacía (las casillas vacías valen NO_PLAYER, no " "); si no,
+        # como abs_board, contestamos que hay piedra seleccionada aunque no se haya llamado a select_st()
         if not (0 <= i < BSIZ and 0 <= j < BSIZ) or board[i][j] != NO_PLAYER:
-            return stone_selected, curr_player, end()
-
-        # Nos aseguramos que la casilla escogida esté vacía
-        if board[i][j] != " ": 
-            return True, curr_player, end()
+            return True, curr_player, DRAW if state['drawn'] else end()
 
         # Si ninguno de las anteriores condiciones fueron ciertas, entonces, movemos la piedra del jugador 
         # actual a las coordenadas "i" y "j" que haya introducido
@@ -190,6 +157,11 @@ def set_board_up(stones_per_player=4):
             # Imprimos una 'X' en la casilla donde quiere mover la piedra el jugador 1, si es el jugador 2 imprimimos 'O'
             board[i][j] = 'X' if curr_player == 0 else 'O'
 
+            # Solo puede hacer KROW en raya la piedra que acaba de llegar: miramos las líneas que pasan por (i, j)
+            for line in LINES_THROUGH[i][j]:
+                if all(board[x][y] == board[i][j] for x, y in WINDOWS[line]):
+                    state['won'] = True
+
             # Añadimos la piedra jugada por el jugador actual en la lista played_stones
             played_stones.append(Stone(i, j, PLAYER_COLOR[curr_player]))
             
@@ -207,8 +179,16 @@ def set_board_up(stones_per_player=4):
                 # que seleccionar una de sus piedras y moverla
                 state['stone_selected'] = False
 
+            # Contamos la posición nueva: si se repite demasiadas veces o la partida es demasiado larga, son tablas
+            state['moves'] += 1
+            key = (tuple(map(tuple, board)), state['curr_player'])
+            state['seen'][key] = state['seen'].get(key, 0) + 1
+            if not end() and (state['seen'][key] >= repetitions or
+                              max_moves is not None and state['moves'] >= max_moves):
+                state['drawn'] = True
+
         # Return 3 values: bool indicating whether a stone is already selected, current player, and boolean indicating the end of the game. 
-        return state['stone_selected'], state['curr_player'], end()
+        return state['stone_selected'], state['curr_player'], DRAW if state['drawn'] else end()
 
 
     # Función para imprimir el tablero
@@ -227,20 +207,16 @@ def set_board_up(stones_per_player=4):
             # Recorre cada columna de la fila actual            
             for col in range(BSIZ):
 
+                # Imprimimos " " para representar las casillas vacías, en vez de que salga -1 (NO_PLAYER)
+                cell = " " if board[row][col] == NO_PLAYER else board[row][col]
+
                 # Si no es la última columna, imprime el contenido de la celda seguido de una barra vertical "|"
                 if col < BSIZ - 1:
-                    print("", board[row][col], "|", end="")
-
+                    print("", cell, "|", end="")
 
                 # Si es la última columna, solo imprime el contenido de la celda
                 else:
-
-                    # Imprimimos " " para representar las casillas vacías, en vez de que salga -1 (NO_PLAYER))
-                    if board[row][col] == NO_PLAYER:     
-                        print("", " ", end="")
-
-                    # Si no es una casilla vacía, imprime el valor que se encuentra en esos índices
-                    print("", board[row][col], end="")
+                    print("", cell, end="")
 
             # Termina la fila actual y pasa a una nueva línea
             print()
@@ -0,0 +1,211 @@
+"""
+Compact binary files of recorded games: each move takes one byte (two on
+boards of 4x4 or more) and each game ends with an end mark. A second
+file keeps the offset of every game, so game k is found at once.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, stones per player ST_PLAYER; draw rules MAX_MOVES, REPETITIONS, DRAW
+from constants import BSIZ, ST_PLAYER, MAX_MOVES, REPETITIONS, DRAW
+
+# Import initialization of the abstract board, to replay the games, and the winning
+# lines through each square, to replay them on bare masks
+from abs_board import set_engine_up
+from bit_board import MASKS_THROUGH
+
+from array import array
+import mmap
+import os
+import struct
+import sys
+
+# Cabecera: identificador, versión, BSIZ, piedras por jugador y bytes por jugada
+MAGIC = b'PA1G'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBB')
+
+# Una jugada se guarda como un número: la casilla de destino k = i*BSIZ + j si se coloca una
+# piedra, o src*BSIZ*BSIZ + dst si se mueve. No hace falta guardar la fase: al leer la partida
+# sabemos cuántas piedras quedan por colocar. El valor más alto marca el final de la partida
+N_CELLS = BSIZ * BSIZ
+MOVE_SIZE = 1 if N_CELLS * N_CELLS < 256 else 2
+END_MARK = (1 << 8*MOVE_SIZE) - 1
+CODE = '<B' if MOVE_SIZE == 1 else '<H'
+
+# Extensión del fichero de índice: un entero de 64 bits con la posición de cada partida
+INDEX_EXT = '.idx'
+
+
+def encode_move(move):
+    'Number of a move in make_move() format'
+    src, (i, j) = move
+    if src is None:
+        return i*BSIZ + j
+    return (src[0]*BSIZ + src[1]) * N_CELLS + i*BSIZ + j
+
+
+def decode_move(code, placing):
+    'Move in make_move() format for a number; placing tells whether stones are still to be placed'
+    if placing:
+        return None, divmod(code, BSIZ)
+    src, dst = divmod(code, N_CELLS)
+    return divmod(src, BSIZ), divmod(dst, BSIZ)
+
+
+def write_games(path, games, stones_per_player = ST_PLAYER):
+
+    '''
+    Save games, an iterable of move lists in make_move() format, to path,
+    and the offset of each game to path + INDEX_EXT. Games are written
+    as they come, so games can be a generator.
+    '''
+
+    code = struct.Struct(CODE)
+    offsets = array('Q')
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BSIZ, stones_per_player, MOVE_SIZE))
+        offset = HEADER.size
+        for moves in games:
+            offsets.append(offset)
+            data = b''.join(code.pack(encode_move(move)) for move in moves) + code.pack(END_MARK)
+            f.write(data)
+            offset += len(data)
+    write_index(path, offsets)
+
+
+def write_index(path, offsets):
+    'Save the offsets of the games in path to its index file'
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    with open(path + INDEX_EXT, 'wb') as f:
+        offsets.tofile(f)
+
+
+def build_index(path):
+    'Rebuild the index file of path by reading the whole file once'
+    offsets = array('Q')
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    offset = HEADER.size
+    end = END_MARK.to_bytes(MOVE_SIZE, 'little')
+    while offset < len(data):
+        offsets.append(offset)
+
+        # Buscamos la marca de final en una posición múltiplo del tamaño de una jugada
+        stop = data.find(end, offset)
+        while stop >= 0 and (stop - offset) % MOVE_SIZE:
+            stop = data.find(end, stop + 1)
+        if stop < 0:
+            raise ValueError(path + " ends in the middle of a game")
+        offset = stop + MOVE_SIZE
+    write_index(path, offsets)
+
+
+def _check_header(data, path):
+    'Stones per player of the file, after checking that it is a game file for this board'
+    magic, version, bsiz, stones_per_player, move_size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or bsiz != BSIZ or move_size != MOVE_SIZE:
+        raise ValueError(path + " is not a game file for this board")
+    return stones_per_player
+
+
+def _decode_game(data, offset, stones_per_player, code):
+    'Moves of the game that starts at offset in data'
+    moves = []
+    left = 2 * stones_per_player
+    value, = code.unpack_from(data, offset)
+    while value != END_MARK:
+        moves.append(decode_move(value, left > 0))
+        if left > 0:
+            left -= 1
+        offset += MOVE_SIZE
+        value, = code.unpack_from(data, offset)
+    return moves
+
+
+def read_games(path):
+    'Generator of the games in path, as move lists, reading the file as it goes'
+
+    code = struct.Struct(CODE)
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    stones_per_player = _check_header(data, path)
+    offset = HEADER.size
+    while offset < len(data):
+        moves = _decode_game(data, offset, stones_per_player, code)
+        yield moves
+        offset += (len(moves) + 1) * MOVE_SIZE
+
+
+def replay_games(path):
+
+    '''
+    Generator that replays every game in path on a new engine from
+    abs_board.set_engine_up(); yield the engine at the end of each game.
+    '''
+
+    with open(path, 'rb') as f:
+        stones_per_player = _check_header(f.read(HEADER.size), path)
+    for moves in read_games(path):
+        engine = set_engine_up(stones_per_player)
+        make_move = engine.make_move
+        for move in moves:
+            make_move(move)
+        yield engine
+
+
+def replay_masks(moves):
+
+    '''
+    Generator that replays moves, in make_move() format, on the stone
+    masks of both players only, with the rules of the engine. Yield, after
+    each move, both masks, the times the position has appeared so far and
+    the end of game value: False, True if the move made a line, or DRAW
+    if the game is drawn. It stops after the move that ends the game.
+    '''
+
+    masks = [0, 0]
+    seen = {}
+    for ply, (src, dst) in enumerate(moves, 1):
+        player = (ply - 1) % 2
+        i, j = dst
+        if src is not None:
+            masks[player] ^= 1 << src[0]*BSIZ + src[1]
+        masks[player] |= 1 << i*BSIZ + j
+
+        # Contamos la posición como hace el motor: con el jugador que mueve ahora
+        key = masks[0], masks[1], ply % 2
+        count = seen.get(key, 0) + 1
+        seen[key] = count
+
+        # Solo puede completar una línea la piedra que acaba de llegar; si no, miramos las tablas
+        own = masks[player]
+        if any(own & line == line for line in MASKS_THROUGH[i][j]):
+            yield masks[0], masks[1], count, True
+            return
+        if count >= REPETITIONS or MAX_MOVES is not None and ply >= MAX_MOVES:
+            yield masks[0], masks[1], count, DRAW
+            return
+        yield masks[0], masks[1], count, False
+
+
+def open_games(path):
+
+    '''
+    Map path and its index file in memory. Return 2 values: number of
+    games and function game(k) that gives the moves of game k.
+    '''
+
+    code = struct.Struct(CODE)
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    stones_per_player = _check_header(data, path)
+    with open(path + INDEX_EXT, 'rb') as f:
+        index = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+    offset = struct.Struct('<Q')
+
+    def game(k):
+        'Moves of game number k, counting from 0'
+        return _decode_game(data, offset.unpack_from(index, 8*k)[0], stones_per_player, code)
+
+    return len(index) // 8, game
@@ -0,0 +1,188 @@
+"""
+Statistics of recorded games (files written by game_record.write_games):
+results, game lengths, most common openings and most repeated positions,
+counting symmetric positions as the same one. The games are replayed on
+bare stone masks, without any board, by a pool of processes that share
+out chunks of games; their partial counts are added up as they finish.
+Usage: python main_analytics.py [-h] [--chunk N] [--workers N] [--plies N] ... file [file ...]
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, end of game value of a draw DRAW
+from constants import BSIZ, DRAW
+
+# Symmetries of the positions and the game files, with their replay on bare masks
+from pos_index import canonical
+import game_record
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+
+# Resultado de cada partida: ganador, tablas o sin acabar (la partida se dejó a medias)
+RESULTS = ('player 0', 'player 1', 'draw', 'unfinished')
+DRAWN, UNFINISHED = 2, 3
+
+
+class Stats:
+    '''Counts over a set of games. The counters of positions keep at most
+    capacity entries: when they grow beyond twice that, the least frequent
+    are dropped, so big corpora use bounded memory and the counts of the
+    most common positions stay exact or nearly so.'''
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.games = 0
+        self.results = [0] * len(RESULTS)
+        self.moves = 0
+        self.longest = 0
+
+        # Posición canónica tras las primeras jugadas -> partidas con cada resultado (en el orden de
+        # RESULTS), y posición canónica -> repeticiones
+        self.openings = {}
+        self.repeated = {}
+
+        # Si alguna vez se han descartado posiciones poco frecuentes
+        self.pruned = False
+
+    def prune(self, counter, weight):
+        'Keep only the capacity keys of counter with most weight(value), if it has grown too much'
+        if len(counter) > 2 * self.capacity:
+            keep = sorted(counter.items(), key = lambda item: weight(item[1]), reverse = True)[:self.capacity]
+            counter.clear()
+            counter.update(keep)
+            self.pruned = True
+
+    def count(self, counter, key, n = 1):
+        'Add n to counter[key], dropping the least frequent keys if needed'
+        counter[key] = counter.get(key, 0) + n
+        self.prune(counter, int)
+
+    def count_opening(self, key, results):
+        'Add the list of games with each result to the opening key'
+        counts = self.openings.get(key)
+        if counts is None:
+            self.openings[key] = list(results)
+            self.prune(self.openings, sum)
+        else:
+            for k, n in enumerate(results):
+                counts[k] += n
+
+    def merge(self, other):
+        'Add the counts of other'
+        self.games += other.games
+        self.results = [a + b for a, b in zip(self.results, other.results)]
+        self.moves += other.moves
+        self.longest = max(self.longest, other.longest)
+        for key, results in other.openings.items():
+            self.count_opening(key, results)
+        for key, n in other.repeated.items():
+            self.count(self.repeated, key, n)
+        self.pruned = self.pruned or other.pruned
+
+
+def replay(moves, stats, plies):
+    '''Count the game moves (in make_move() format) in stats: result, length,
+    canonical position after plies moves with the result of the game, and
+    positions repeated in the game.'''
+
+    result = UNFINISHED
+    opening = None
+    for ply, (mask0, mask1, count, end) in enumerate(game_record.replay_masks(moves), 1):
+        if ply == plies:
+            opening = canonical(mask0, mask1)
+
+        # Cada vez que una posición vuelve a aparecer cuenta como repetición
+        if count > 1:
+            stats.count(stats.repeated, canonical(mask0, mask1))
+        if end:
+            result = DRAWN if end == DRAW else (ply - 1) % 2
+
+    # Si la partida acaba antes de las primeras jugadas, la apertura es la posición final
+    if opening is None and result != UNFINISHED:
+        opening = canonical(mask0, mask1)
+    if opening is not None:
+        results = [0] * len(RESULTS)
+        results[result] = 1
+        stats.count_opening(opening, results)
+
+    stats.games += 1
+    stats.results[result] += 1
+    stats.moves += len(moves)
+    stats.longest = max(stats.longest, len(moves))
+
+
+def analyse(path, first, last, plies, capacity):
+    'Stats of games first to last - 1 of the game file path'
+    stats = Stats(capacity)
+    _, game = game_record.open_games(path)
+    for k in range(first, last):
+        replay(game(k), stats, plies)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Statistics of files of recorded games.")
+    parser.add_argument('files', nargs = '+', help = "game files, each with its index file")
+    parser.add_argument('--chunk', type = int, default = 100000, help = "games sent to a process at once")
+    parser.add_argument('--workers', type = int, default = None, help = "processes (default: all cores)")
+    parser.add_argument('--plies', type = int, default = 4, help = "moves that make up an opening")
+    parser.add_argument('--top', type = int, default = 10, help = "openings and positions to show")
+    parser.add_argument('--capacity', type = int, default = 100000,
+                        help = "positions kept in each counter")
+    parser.add_argument('--json', action = 'store_true', help = "print the statistics as JSON")
+    args = parser.parse_args()
+
+    # Trozos de cada fichero, según el número de partidas de su índice
+    tasks = []
+    for path in args.files:
+        n_games, _ = game_record.open_games(path)
+        tasks += [(path, first, min(first + args.chunk, n_games)) for first in range(0, n_games, args.chunk)]
+
+    stats = Stats(args.capacity)
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(analyse, *task, args.plies, args.capacity) for task in tasks]
+        for future in as_completed(futures):
+            stats.merge(future.result())
+
+    games = stats.games or 1
+    openings = sorted(stats.openings.items(), key = lambda item: sum(item[1]), reverse = True)[:args.top]
+    repeated = sorted(stats.repeated.items(), key = lambda item: item[1], reverse = True)[:args.top]
+
+    if args.json:
+        print(json.dumps({
+            'games': stats.games,
+            'results': dict(zip(RESULTS, stats.results)),
+            'average_length': stats.moves / games,
+            'longest': stats.longest,
+            'openings': [{'mask0': m0, 'mask1': m1, 'games': sum(results),
+                          'results': dict(zip(RESULTS, results))} for (m0, m1), results in openings],
+            'repeated': [{'mask0': m0, 'mask1': m1, 'repetitions': n} for (m0, m1), n in repeated],
+            'approximate': stats.pruned,
+        }, indent = 2))
+        return
+
+    print(stats.games, "games")
+    for name, n in zip(RESULTS, stats.results):
+        print("  %-10s %10d  %5.1f%%" % (name, n, 100 * n / games))
+    print("Average length %.2f moves, longest %d" % (stats.moves / games, stats.longest))
+    note = " (approximate counts)" if stats.pruned else ""
+    print("Most common openings after %d moves%s:" % (args.plies, note))
+    print("  %s  %11s  " % ("position".ljust(BSIZ*BSIZ + BSIZ - 1), "games") +
+          "  ".join("%10s" % name for name in RESULTS))
+    for (mask0, mask1), results in openings:
+        print("  %s  %11d  " % (diagram(mask0, mask1), sum(results)) +
+              "  ".join("%9.1f%%" % (100 * n / sum(results)) for n in results))
+    print("Most repeated positions%s:" % note)
+    for (mask0, mask1), n in repeated:
+        print("  %s  %d repetitions" % (diagram(mask0, mask1), n))
+
+
+def diagram(mask0, mask1):
+    'The position in one line, row by row: X, O or . for empty, rows separated by /'
+    return "/".join("".join('X' if mask0 >> i*BSIZ + j & 1 else 'O' if mask1 >> i*BSIZ + j & 1 else '.'
+                            for j in range(BSIZ)) for i in range(BSIZ))
+
+
+if __name__ == '__main__':
+    main()
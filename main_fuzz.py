@@ -0,0 +1,131 @@
+"""
+Differential test of the board backends: random streams of select_st()
+and move_st() calls are played on every backend, which must give the same
+answers, stones and drawings; the time of each call is measured too.
+Usage: python main_fuzz.py [-h] [--streams N] [--length N] [--seed N] [--max-moves N] [backends ...]
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, stones per player ST_PLAYER
+from constants import BSIZ, ST_PLAYER
+
+# Registry of the backends
+from backends import BACKENDS, get_backend
+
+import argparse
+import contextlib
+from functools import partial
+import io
+import sys
+from random import Random
+from time import perf_counter_ns
+
+# Operaciones medidas, en el orden del informe
+OPERATIONS = ('select_st', 'move_st', 'stones', 'draw_txt')
+
+# Proporción de llamadas a move_st() sin piedra seleccionada, cuando tocaría select_st()
+UNSELECTED = 0.2
+
+
+def make_stream(set_board_up, rng, length):
+    '''Random stream of at most length calls ('select_st' or 'move_st', i, j),
+    with coordinates sometimes off the board, choosing each call as a player
+    would from the answers of set_board_up(), except that some moves come
+    with no stone selected; it stops at the end of the game.'''
+
+    _, select_st, move_st, _ = set_board_up(ST_PLAYER)
+    stream = []
+    stone_selected, end = True, False
+    with contextlib.redirect_stdout(io.StringIO()):
+        while len(stream) < length and not end:
+            i, j = rng.randrange(-1, BSIZ + 1), rng.randrange(-1, BSIZ + 1)
+            if stone_selected or rng.random() < UNSELECTED:
+                stream.append(('move_st', i, j))
+                stone_selected, _, end = move_st(i, j)
+            else:
+                stream.append(('select_st', i, j))
+                stone_selected = bool(select_st(i, j))
+    return stream
+
+
+def run_stream(set_board_up, stream, times):
+    '''Play stream on a new board from set_board_up(); add the nanoseconds
+    of each call to times[operation]; return the list of observations.'''
+
+    stones, select_st, move_st, draw_txt = set_board_up(ST_PLAYER)
+    functions = {'select_st': select_st, 'move_st': move_st}
+    observed = []
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        for operation, i, j in stream:
+            start = perf_counter_ns()
+            result = functions[operation](i, j)
+            times[operation].append(perf_counter_ns() - start)
+
+            # select_st() puede devolver None en vez de False: comparamos su valor como booleano
+            observed.append(bool(result) if operation == 'select_st' else tuple(result))
+
+            start = perf_counter_ns()
+            played = sorted(stones())
+            times['stones'].append(perf_counter_ns() - start)
+            observed.append(played)
+
+            # Los mensajes de jugada no válida son propios de cada backend: solo comparamos el dibujo
+            out.seek(0)
+            out.truncate()
+            start = perf_counter_ns()
+            draw_txt(False)
+            times['draw_txt'].append(perf_counter_ns() - start)
+            observed.append(out.getvalue())
+    return observed
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Check that all board backends behave the same.")
+    parser.add_argument('backends', nargs = '*', default = list(BACKENDS),
+                        help = "backends to compare, among " + ", ".join(BACKENDS) + " (default: all)")
+    parser.add_argument('--streams', type = int, default = 1000, help = "random streams of calls")
+    parser.add_argument('--length', type = int, default = 300, help = "maximum calls per stream")
+    parser.add_argument('--seed', type = int, default = 0, help = "seed of the random generator")
+    parser.add_argument('--max-moves', type = int, default = None,
+                        help = "moves before a game is drawn (default: the backends' own), "
+                               "small values test the draws")
+    args = parser.parse_args()
+    if len(args.backends) < 2:
+        parser.error("at least two backends are needed")
+    for name in args.backends:
+        if name not in BACKENDS:
+            parser.error("unknown backend " + name)
+
+    # El primer backend genera los flujos; todos los demás se comparan con él
+    reference = args.backends[0]
+    boards = {name: get_backend(name) if args.max_moves is None
+                    else partial(get_backend(name), max_moves = args.max_moves)
+              for name in args.backends}
+    times = {name: {operation: [] for operation in OPERATIONS} for name in args.backends}
+    rng = Random(args.seed)
+    mismatches = 0
+    for number in range(args.streams):
+        stream = make_stream(boards[reference], rng, args.length)
+        expected = run_stream(boards[reference], stream, times[reference])
+        for name in args.backends[1:]:
+            observed = run_stream(boards[name], stream, times[name])
+            if observed != expected:
+                mismatches += 1
+                step = next(k for k, (a, b) in enumerate(zip(observed, expected)) if a != b) // 3
+                print("Stream %d: %s differs from %s at call %d %s" % (number, name, reference, step,
+                                                                     stream[step]))
+                print("  %s: %r" % (reference, expected[3*step:3*step + 3]))
+                print("  %s: %r" % (name, observed[3*step:3*step + 3]))
+
+    # Tiempo medio por llamada de cada operación, en microsegundos
+    print("%-12s" % "backend" + "".join("%12s" % operation for operation in OPERATIONS), "(us per call)")
+    for name in args.backends:
+        print("%-12s" % name + "".join("%12.2f" % (sum(ns) / len(ns) / 1000 if ns else 0)
+                                       for ns in times[name].values()))
+    print(mismatches, "mismatches in", args.streams, "streams")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,13 +4,17 @@ Copyleft: MIT License (https://en.wikipedia.org/wiki/MIT_License)
 
 Pygame-based handling of a simple tic-tac-toe-like board, 2021.
 Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+Runs without a window with the environment variable SDL_VIDEODRIVER=dummy.
 """
 
 # Import library for game programming 
 import pygame
+import sys
+import threading
 
 # Import: colors BLACK, GRAY, WHITE, PLAYER_COLOR; 
-#         board dimensions BSIZ, WIDTH, HEIGHT, SLOT, SEP, ROOM, RAD
+#         board dimensions BSIZ, WIDTH, HEIGHT, SLOT, SEP, ROOM, RAD;
+#         end of game value of a draw DRAW
 from constants import *
 
 # Initialize the game engine, indicate a caption and
@@ -18,24 +22,40 @@ from constants import *
 pygame.init()
 screen = pygame.display.set_mode( (WIDTH, HEIGHT) )
 pygame.display.set_caption("Tres en ratlla")
-clock = pygame.time.Clock()
+font = pygame.font.Font(None, max(SLOT // 3, 16))
 
-# Import initialization of the separately programmed abstract board:
-from abs_board import set_board_up
+# Import the registry of separately programmed boards
+# and initialization of the computer player:
+from backends import BACKENDS, DEFAULT_BACKEND, set_game_up
+from ai_player import set_player_up
 
-# Prepare board:
-# this will set up all stones as unplayed, select a first stone to play,
-# and obtain functions to handle them as follows:
-#   the call stones() allows one to loop on all stones,
-#   the call select_st(i, j) marks as selected the stone at these coordinates,
-#   the call move_st(i, j) 
-#     if the square at these coordinates is free, moves the selected  
-#     stone there, changes player, unselects the stone and checks for 
-#     end of game; otherwise, does nothing, leaving the stone selected;
-#     returns: bool "stone still selected", next player (may be the same), 
-#     and bool "end of game"
-#   the call to draw_txt(end) prints a text-based version of the board
-stones, select_st, move_st, draw_txt = set_board_up()
+# Optional measures of the board functions
+from metrics import Metrics
+
+# Recorded games, for the replay
+import game_record
+
+# Optional arguments: player (0 or 1) moved by the computer; board implementation
+import argparse
+parser = argparse.ArgumentParser(description = "Play on the graphical board.")
+parser.add_argument('ai_player', nargs = '?', type = int, choices = (0, 1), default = None,
+                    help = "player moved by the computer")
+parser.add_argument('--backend', choices = BACKENDS, default = DEFAULT_BACKEND,
+                    help = "board implementation to play on (default: %(default)s)")
+parser.add_argument('--metrics', metavar = 'FILE', default = None,
+                    help = "measure the board functions and save the measures to FILE at the end "
+                           "(Prometheus text if FILE ends in .prom, JSON otherwise)")
+parser.add_argument('--replay', metavar = 'FILE', default = None,
+                    help = "instead of playing, step through a game recorded in FILE "
+                           "with the arrow keys or by clicking on the bar below the board")
+parser.add_argument('--game', type = int, default = 0, help = "number of the game to replay, from 0")
+parser.add_argument('--keyframe', type = int, default = 64,
+                    help = "moves between the positions kept while replaying (default: %(default)s)")
+args = parser.parse_args()
+if args.keyframe < 1:
+    parser.error("--keyframe must be at least 1")
+ai_player = args.ai_player
+metrics = Metrics() if args.metrics is not None else None
 
 # Grid:
 def trans_coord(x, y):
@@ -55,21 +75,216 @@ def draw_stone(screen, i, j, color):
         (ROOM + 0.5*SEP + (i + 0.5)*(SLOT + SEP), 0.5*SEP + (j + 0.5)*(SLOT + SEP)), 
         RAD)
 
-def draw_board(curr_player = 0, end = False):
-    'on fresh screen, draw grid, stones, player turn mark, then make it appear'
-    screen.fill(WHITE if not end else GRAY)
+def square_rect(i, j):
+    'screen rectangle of the square at board coordinates i, j'
+    return pygame.Rect(ROOM + SEP + i*(SLOT + SEP), SEP + j*(SLOT + SEP), SLOT, SLOT)
+
+# Rectangle showing who plays next
+TURN_RECT = pygame.Rect(ROOM + SEP, BSIZ*(SEP + SLOT) + SEP, BSIZ*(SEP + SLOT) - SEP, SLOT)
+
+def make_background(color):
+    'surface with the empty grid on the given color, drawn only once'
+    background = pygame.Surface((WIDTH, HEIGHT))
+    background.fill(color)
     for i in range(BSIZ):
         for j in range(BSIZ):
-            draw_square(screen, i, j)
+            draw_square(background, i, j)
+    return background
+
+background = make_background(WHITE)
+
+# Stones currently on the screen, by square, to redraw only the squares that change
+shown = {}
+
+def draw_board(curr_player = 0, end = False):
+    'on fresh screen, draw grid, stones, player turn mark, then make it appear'
+    screen.blit(background if not end else make_background(GRAY), (0, 0))
+    shown.clear()
     for s in stones():
         draw_stone(screen, *s)
+        shown[s.x, s.y] = s.color
     if not end:
         'colored rectangle indicates who plays next'
-        pygame.draw.rect(screen, PLAYER_COLOR[curr_player], 
-        (ROOM + SEP, BSIZ*(SEP + SLOT) + SEP, BSIZ*(SEP + SLOT) - SEP, SLOT)
-        )
+        pygame.draw.rect(screen, PLAYER_COLOR[curr_player], TURN_RECT)
+    elif end == DRAW:
+        'nobody has won: say so where the turn mark was'
+        text = font.render("draw", True, BLACK)
+        screen.blit(text, text.get_rect(center = TURN_RECT.center))
+    pygame.display.flip()
+
+def update_board(curr_player = 0, end = False):
+    'redraw only the squares whose stone changed and the player turn mark'
+    if end:
+        "the whole background changes color"
+        draw_board(curr_player, end)
+        return
+    now = {(s.x, s.y): s.color for s in stones()}
+    changed = [square for square in shown.keys() | now.keys() if shown.get(square) != now.get(square)]
+    dirty = [TURN_RECT]
+    for i, j in changed:
+        rect = square_rect(i, j)
+        screen.blit(background, rect, rect)
+        if (i, j) in now:
+            draw_stone(screen, i, j, now[i, j])
+        dirty.append(rect)
+    pygame.draw.rect(screen, PLAYER_COLOR[curr_player], TURN_RECT)
+    shown.clear()
+    shown.update(now)
+    pygame.display.update(dirty)
+
+# The computer thinks in another thread, so that the window keeps answering;
+# when it is done it posts an AI_DONE event with its move
+AI_DONE = pygame.event.custom_type()
+stop_thinking = threading.Event()
+thinker = None
+
+def think():
+    'search the move of the computer and post it as an event'
+    move = choose_move(stop_thinking)
+    if not stop_thinking.is_set():
+        pygame.event.post(pygame.event.Event(AI_DONE, move = move))
+
+def draw_thinking(curr_player):
+    'mark the player turn rectangle while the computer thinks'
+    pygame.draw.rect(screen, PLAYER_COLOR[curr_player], TURN_RECT)
+    text = font.render("thinking...", True, WHITE)
+    screen.blit(text, text.get_rect(center = TURN_RECT.center))
+    pygame.display.update(TURN_RECT)
+
+def computer_move(move):
+    'play the move of the computer, return the same 3 values as move_st()'
+    src, dst = move
+    if src is not None:
+        select_st(*src)
+    return move_st(*dst)
+
+# Replay of a recorded game: the position after every keyframe moves is kept,
+# so that going to any move only needs to apply at most keyframe moves
+def apply_move(masks, n, move):
+    'apply move number n, counting from 0, to the stone masks of both players'
+    src, (i, j) = move
+    if src is not None:
+        masks[n % 2] ^= 1 << src[0]*BSIZ + src[1]
+    masks[n % 2] |= 1 << i*BSIZ + j
+
+def load_replay(path, number, keyframe):
+    'moves of the game, masks every keyframe moves and end of game value after the last move'
+    n_games, game = game_record.open_games(path)
+    if not 0 <= number < n_games:
+        parser.error("%s has %d games" % (path, n_games))
+    moves = game(number)
+
+    # Una sola pasada por la partida con las reglas del motor: posiciones clave y cómo acaba
+    keyframes = [(0, 0)]
+    end = False
+    total = 0
+    for total, (mask0, mask1, _, end) in enumerate(game_record.replay_masks(moves), 1):
+        if total % keyframe == 0:
+            keyframes.append((mask0, mask1))
+    return moves[:total], keyframes, end
+
+def seek(moves, keyframes, keyframe, n):
+    'masks after the first n moves, from the nearest kept position before n'
+    masks = list(keyframes[n // keyframe])
+    for m in range(n - n % keyframe, n):
+        apply_move(masks, m, moves[m])
+    return masks
+
+# Bar at the bottom of the player turn rectangle for the replay, with a mark at the current move
+BAR_HEIGHT = max(SLOT // 4, 8)
+BAR_RECT = pygame.Rect(TURN_RECT.left, TURN_RECT.bottom - BAR_HEIGHT, TURN_RECT.width, BAR_HEIGHT)
+
+def draw_replay(masks, n, total, end):
+    'draw the position after n moves of total, the player to move and the bar'
+    screen.blit(background if not (n == total and end) else make_background(GRAY), (0, 0))
+    for i in range(BSIZ):
+        for j in range(BSIZ):
+            for player in (0, 1):
+                if masks[player] >> i*BSIZ + j & 1:
+                    draw_stone(screen, i, j, PLAYER_COLOR[player])
+    pygame.draw.rect(screen, PLAYER_COLOR[n % 2], TURN_RECT)
+    text = font.render("%d / %d%s" % (n, total, " draw" if n == total and end == DRAW else ""), True, WHITE)
+    screen.blit(text, text.get_rect(center = (TURN_RECT.centerx, (TURN_RECT.top + BAR_RECT.top) // 2)))
+    pygame.draw.rect(screen, WHITE, BAR_RECT)
+    x = BAR_RECT.left + (BAR_RECT.width - BAR_HEIGHT) * n // max(total, 1)
+    pygame.draw.rect(screen, BLACK, (x, BAR_RECT.top, BAR_HEIGHT, BAR_HEIGHT))
     pygame.display.flip()
 
+def run_replay(path, number, keyframe):
+    'show a recorded game and go through it with the keys or the bar, until the window is closed'
+    moves, keyframes, end = load_replay(path, number, keyframe)
+    total = len(moves)
+    pygame.display.set_caption("Tres en ratlla: %s, game %d" % (path, number))
+
+    # Teclas: una jugada adelante o atrás, keyframe jugadas, una décima parte de la partida,
+    # o principio y final
+    page = max(total // 10, 1)
+    steps = {pygame.K_RIGHT: 1, pygame.K_LEFT: -1, pygame.K_UP: keyframe, pygame.K_DOWN: -keyframe,
+             pygame.K_PAGEUP: page, pygame.K_PAGEDOWN: -page}
+    n = 0
+    draw_replay(keyframes[0], n, total, end)
+
+    # Si se está arrastrando la marca de la barra (el botón izquierdo se pulsó sobre ella)
+    dragging = False
+
+    # Solo despiertan el bucle las teclas, el ratón y cerrar la ventana; al volver se deja pasar
+    # todo de nuevo, como al principio
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed((pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                              pygame.MOUSEMOTION))
+    try:
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                return
+            target = n
+            if event.type == pygame.KEYDOWN:
+                if event.key in steps:
+                    target = n + steps[event.key]
+                elif event.key == pygame.K_HOME:
+                    target = 0
+                elif event.key == pygame.K_END:
+                    target = total
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and BAR_RECT.collidepoint(event.pos):
+                "clicking on the bar goes to the move at that point and starts dragging"
+                dragging = True
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                dragging = False
+            if dragging and event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION):
+                target = round((event.pos[0] - BAR_RECT.left - BAR_HEIGHT / 2) * total
+                               / (BAR_RECT.width - BAR_HEIGHT))
+            target = min(max(target, 0), total)
+            if target != n:
+                n = target
+                draw_replay(seek(moves, keyframes, keyframe, n), n, total, end)
+    finally:
+        pygame.event.set_allowed(None)
+
+# In replay mode there is no game to play: no board nor computer player are prepared
+if args.replay is not None:
+    run_replay(args.replay, args.game, args.keyframe)
+    pygame.quit()
+    sys.exit()
+
+# Prepare board:
+# this will set up all stones as unplayed, select a first stone to play,
+# and obtain functions to handle them as follows:
+#   the call stones() allows one to loop on all stones,
+#   the call select_st(i, j) marks as selected the stone at these coordinates,
+#   the call move_st(i, j) 
+#     if the square at these coordinates is free, moves the selected  
+#     stone there, changes player, unselects the stone and checks for 
+#     end of game; otherwise, does nothing, leaving the stone selected;
+#     returns: bool "stone still selected", next player (may be the same), 
+#     and bool "end of game" (DRAW if the game is drawn)
+#   the call to draw_txt(end) prints a text-based version of the board
+# The engine follows the game on any backend, for the computer player
+engine, stones, select_st, move_st, draw_txt = set_game_up(args.backend, metrics = metrics)
+
+# the call choose_move() returns the move of the computer as (src, dst),
+# src being None while there are stones to place
+choose_move = set_player_up(engine)
+
 # set_board_up() already selects a first stone; set curr_player to zero.
 stone_selected = True
 curr_player = 0
@@ -83,26 +298,45 @@ done = False
 # Play until game ends
 end = False
 
+# Only clicks, closing the window and the moves of the computer wake up the loop
+pygame.event.set_blocked(None)
+pygame.event.set_allowed((pygame.QUIT, pygame.MOUSEBUTTONDOWN, AI_DONE))
+
 while not done:
-    
-    # This limits the while loop to a max of 10 times per second.
-    # Leave this out and we will use all CPU we can.
-    clock.tick(10)
-    
-    for event in pygame.event.get(): 
-        "User did something"
-        if event.type == pygame.QUIT:
-            "User clicked 'close window', set flag to exit loop"
-            done = True
-        if event.type == pygame.MOUSEBUTTONDOWN and not end:
-            "game is afoot and user clicked something"
-            if stone_selected:
-                "User should click on a free destination square, otherwise ignore event"
-                stone_selected, curr_player, end = move_st(*trans_coord(*event.pos))
-                draw_board(curr_player, end)
-            else:
-                "User should click on a stone to select it"
-                stone_selected = select_st(*trans_coord(*event.pos))
-
-# Friendly finish-up:
+
+    if curr_player == ai_player and not end and thinker is None:
+        "computer's turn: start thinking, meanwhile the loop goes on"
+        thinker = threading.Thread(target = think, daemon = True)
+        thinker.start()
+        draw_thinking(curr_player)
+
+    # Sleep until the user does something: no polling, no CPU use while waiting.
+    event = pygame.event.wait()
+    "User did something"
+    if event.type == pygame.QUIT:
+        "User clicked 'close window', set flag to exit loop and stop the computer"
+        done = True
+        stop_thinking.set()
+    if event.type == AI_DONE:
+        "the computer has chosen its move"
+        thinker = None
+        stone_selected, curr_player, end = computer_move(event.move)
+        update_board(curr_player, end)
+    if event.type == pygame.MOUSEBUTTONDOWN and not end and thinker is None:
+        "game is afoot and user clicked something"
+        if stone_selected:
+            "User should click on a free destination square, otherwise ignore event"
+            stone_selected, curr_player, end = move_st(*trans_coord(*event.pos))
+            update_board(curr_player, end)
+        else:
+            "User should click on a stone to select it"
+            stone_selected = select_st(*trans_coord(*event.pos))
+
+# Friendly finish-up: wait for the computer and stop its processes, if it has any
+if thinker is not None:
+    thinker.join()
+if hasattr(choose_move, 'close'):
+    choose_move.close()
 pygame.quit()
+if metrics is not None:
+    metrics.save(args.metrics)
@@ -0,0 +1,174 @@
+"""
+Perft: count every legal sequence of moves up to a given depth from the
+initial position, to measure the speed of a board implementation and to
+check that it accepts exactly the legal moves. The engine counts with
+make_move()/unmake_move(); the other backends are driven only through
+select_st() and move_st(), as the main programs drive them.
+Usage: python main_perft.py [-h] [--backend NAME] [--stones N] [--workers N] [--check] depth
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, stones per player ST_PLAYER
+from constants import BSIZ, ST_PLAYER
+
+# Import initialization of the abstract board, the reference for the counts, and the other backends
+from abs_board import set_engine_up
+import backends
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import os
+import sys
+from time import perf_counter
+
+# Tableros que se pueden contar: 'engine' es abs_board con make_move(), el resto usan set_board_up()
+BACKENDS = ('engine',) + tuple(backends.BACKENDS)
+
+SQUARES = tuple((i, j) for i in range(BSIZ) for j in range(BSIZ))
+
+
+def engine_perft(engine, depth):
+    'Number of move sequences of length depth from the current position of engine'
+
+    if depth == 0:
+        return 1
+    make_move, unmake_move, legal_moves = engine.make_move, engine.unmake_move, engine.legal_moves
+    if depth == 1:
+        return sum(1 for _ in legal_moves())
+    nodes = 0
+    for move in list(legal_moves()):
+        make_move(move)
+        nodes += engine_perft(engine, depth - 1)
+        unmake_move()
+    return nodes
+
+
+def replay(set_board_up, stones_per_player, path):
+    '''New board from set_board_up(stones_per_player) with the moves of path
+    played through select_st() and move_st(); return its 4 functions and the
+    last 3 values returned by move_st().'''
+
+    functions = set_board_up(stones_per_player)
+    _, select_st, move_st, _ = functions
+    state = True, 0, False
+    for src, dst in path:
+        if src is not None:
+            select_st(*src)
+        state = move_st(*dst)
+    return functions, state
+
+
+def api_moves(set_board_up, stones_per_player, path, state):
+    '''Moves, in make_move() format, that the board reached by path accepts;
+    state holds the values returned by move_st() at that board. A move is
+    accepted when move_st() changes the current player.'''
+
+    stone_selected, player, end = state
+    if end:
+        return []
+    moves = []
+
+    # Fase de colocación: probamos todas las casillas; una jugada rechazada no cambia nada,
+    # así que solo hace falta un tablero nuevo después de cada jugada aceptada
+    if stone_selected:
+        board = None
+        for dst in SQUARES:
+            if board is None:
+                (_, _, move_st, _), _ = replay(set_board_up, stones_per_player, path)
+                board = move_st
+            if board(*dst)[1] != player:
+                moves.append((None, dst))
+                board = None
+        return moves
+
+    # Fase de movimiento: un tablero por piedra que se puede seleccionar, y otro después de cada jugada
+    for src in SQUARES:
+        (_, select_st, move_st, _), _ = replay(set_board_up, stones_per_player, path)
+        if not select_st(*src):
+            continue
+        for dst in SQUARES:
+            if move_st(*dst)[1] != player:
+                moves.append((src, dst))
+                (_, select_st, move_st, _), _ = replay(set_board_up, stones_per_player, path)
+                select_st(*src)
+    return moves
+
+
+def api_perft(set_board_up, stones_per_player, path, state, depth):
+    'Number of move sequences of length depth after path, using only select_st() and move_st()'
+
+    if depth == 0:
+        return 1
+    moves = api_moves(set_board_up, stones_per_player, path, state)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        path.append(move)
+        _, child = replay(set_board_up, stones_per_player, path)
+        nodes += api_perft(set_board_up, stones_per_player, path, child, depth - 1)
+        path.pop()
+    return nodes
+
+
+def perft(backend, stones_per_player, path, depth):
+    'Number of move sequences of length depth after the moves of path, counted by backend'
+
+    if backend == 'engine':
+        engine = set_engine_up(stones_per_player)
+        for move in path:
+            engine.make_move(move)
+        return engine_perft(engine, depth)
+
+    # Los tableros escriben un mensaje por cada jugada no válida: los descartamos
+    set_board_up = backends.get_backend(backend)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        _, state = replay(set_board_up, stones_per_player, path)
+        return api_perft(set_board_up, stones_per_player, list(path), state, depth)
+
+
+def divide(pool, backend, stones_per_player, depth):
+    'Count of each root move of the initial position, counted in parallel by pool'
+    root = set_engine_up(stones_per_player)
+    moves = list(root.legal_moves())
+    futures = [pool.submit(perft, backend, stones_per_player, [move], depth - 1) for move in moves]
+    return {move: future.result() for move, future in zip(moves, futures)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Count the legal move sequences up to a depth.")
+    parser.add_argument('depth', type = int, help = "moves in each sequence")
+    parser.add_argument('--backend', choices = BACKENDS, default = 'engine',
+                        help = "board to count with (default: engine)")
+    parser.add_argument('--stones', type = int, default = ST_PLAYER, help = "stones per player")
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = "processes sharing the root moves (0: all cores)")
+    parser.add_argument('--check', action = 'store_true',
+                        help = "compare every count with the engine's and fail on a difference")
+    args = parser.parse_args()
+
+    pool = ProcessPoolExecutor(args.workers or None) if args.workers != 1 else None
+    failed = False
+    print("depth %12s %10s %12s" % ("nodes", "seconds", "nodes/s"))
+    for depth in range(1, args.depth + 1):
+        start = perf_counter()
+        if pool is not None:
+            nodes = sum(divide(pool, args.backend, args.stones, depth).values())
+        else:
+            nodes = perft(args.backend, args.stones, [], depth)
+        elapsed = perf_counter() - start
+        line = "%5d %12d %10.3f %12.0f" % (depth, nodes, elapsed, nodes / elapsed if elapsed else 0)
+        if args.check and args.backend != 'engine':
+            expected = perft('engine', args.stones, [], depth)
+            if nodes != expected:
+                line += "  MISMATCH: engine counts %d" % expected
+                failed = True
+        print(line, flush = True)
+    if pool is not None:
+        pool.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Game server: every connection gets its own game, played with one command
+per line, and all of them are served by a single asyncio process.
+Usage: python main_server.py [--host HOST] [--port PORT] [--unix PATH]
+
+Commands and answers:
+  SELECT i j   ->  OK <1 if the stone was selected, else 0>
+  MOVE i j     ->  OK <stone still selected 0/1> <next player> <end of game 0/1, 2 if drawn>
+  BOARD        ->  OK <BSIZ*BSIZ characters, row by row: X, O or . for empty>
+  NEW          ->  OK  (starts a new game)
+  QUIT         ->  BYE
+Anything else gets ERR and a message, and so do SELECT and MOVE once the
+game is over. A line longer than MAX_LINE gets ERR and closes the connection.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, stones per player ST_PLAYER
+from constants import BSIZ, ST_PLAYER
+
+# Compact board, one per connection
+from board import Board
+
+import argparse
+import asyncio
+
+# Longitud máxima de una línea y tiempo máximo sin recibir nada, en segundos
+MAX_LINE = 256
+IDLE_TIMEOUT = 600
+
+# Para BOARD: contenido de cada casilla (0 vacía, 1 jugador 0, 2 jugador 1) como carácter
+CELL_CHARS = bytes.maketrans(b'\x00\x01\x02', b'.XO')
+
+
+def answer(board, line):
+    'Run the command in line on board; return the answer line and whether to close'
+
+    words = line.split()
+    if not words:
+        return "ERR empty command", False
+    command = words[0].upper()
+
+    if command in ("SELECT", "MOVE"):
+        try:
+            i, j = map(int, words[1:])
+        except ValueError:
+            return "ERR usage: " + command + " i j", False
+
+        # Acabada la partida (KROW en raya o tablas) no se aceptan más jugadas hasta NEW
+        if board.game_over():
+            return "ERR game over", False
+        if command == "SELECT":
+            return "OK %d" % board.select_st(i, j), False
+        stone_selected, curr_player, end = board.move_st(i, j)
+        return "OK %d %d %d" % (stone_selected, curr_player, end), False
+
+    if command == "BOARD":
+        return "OK " + board.cells.translate(CELL_CHARS).decode(), False
+    if command == "QUIT":
+        return "BYE", True
+    return "ERR unknown command " + words[0], False
+
+
+async def session(reader, writer):
+    'Play a game with one client until it quits or disconnects'
+
+    board = Board(ST_PLAYER)
+    writer.write(b"OK PA1 %d %d\n" % (BSIZ, ST_PLAYER))
+    try:
+        while True:
+            try:
+                line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+            except ValueError:
+
+                # Línea demasiado larga: no sabemos dónde acaba, así que avisamos y cerramos
+                writer.write(b"ERR line too long\n")
+                await writer.drain()
+                break
+            if not line:
+                break
+            line = line.decode(errors = 'replace')
+            if line.strip().upper() == "NEW":
+                board = Board(ST_PLAYER)
+                reply, close = "OK", False
+            else:
+                reply, close = answer(board, line)
+            writer.write(reply.encode() + b"\n")
+
+            # Si el cliente no lee las respuestas, dejamos de leer sus comandos hasta que lo haga
+            await writer.drain()
+            if close:
+                break
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, unix):
+    'Accept connections on a TCP port or on a Unix socket'
+    if unix:
+        server = await asyncio.start_unix_server(session, unix, limit = MAX_LINE)
+    else:
+        server = await asyncio.start_server(session, host, port, limit = MAX_LINE)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Serve games over TCP or a Unix socket.")
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8033)
+    parser.add_argument('--unix', default = None, help = "path of a Unix socket, instead of TCP")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Round-robin tournament between computer players, using every core:
+games are played in chunks by a pool of processes and the standings
+are printed as chunks finish.
+Usage: python main_tournament.py [-h] [--games N] [--chunk N] ... [bots ...]
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: stones per player ST_PLAYER, NO_PLAYER
+from constants import ST_PLAYER, NO_PLAYER
+
+# Import the abstract board and the computer player
+from abs_board import set_engine_up
+from ai_player import set_player_up
+import mcts_player
+import td_player
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+import os
+from random import Random
+
+
+def random_bot(engine, rng):
+    'Player that chooses a random legal move'
+    legal_moves = engine.legal_moves
+
+    def choose_move():
+        'Return a random legal move, or None if there is none (the game has ended)'
+        moves = list(legal_moves())
+        return rng.choice(moves) if moves else None
+
+    return choose_move
+
+
+def alphabeta_bot(engine, rng):
+    'Alpha-beta player with a short time limit'
+    return set_player_up(engine, time_limit = 0.05)
+
+
+def mcts_bot(engine, rng):
+    'Monte Carlo tree search player with a short time limit'
+    return mcts_player.set_player_up(engine, time_limit = 0.05, seed = rng.getrandbits(32))
+
+
+def td_bot(engine, rng):
+    'Greedy player on the values learned by self-play (python td_player.py)'
+    return td_player.set_player_up(engine)
+
+
+# Jugadores disponibles: cada uno se prepara con el tablero de la partida y un generador aleatorio
+# y devuelve la función que elige la jugada
+BOTS = {
+    'random': random_bot,
+    'alphabeta': alphabeta_bot,
+    'mcts': mcts_bot,
+    'td': td_bot,
+}
+
+
+def play_game(bot0, bot1, rng, max_plies, opening):
+    'Play a game between two bots (names in BOTS); return the winner or NO_PLAYER for a draw'
+
+    engine = set_engine_up(ST_PLAYER)
+    players = (BOTS[bot0](engine, rng), BOTS[bot1](engine, rng))
+    try:
+        return play_out(engine, players, rng, max_plies, opening)
+    finally:
+
+        # Los jugadores con procesos propios (mcts con workers > 1) los paran al acabar la partida
+        for player in players:
+            if hasattr(player, 'close'):
+                player.close()
+
+
+def play_out(engine, players, rng, max_plies, opening):
+    'Play the game on engine with the functions players; return the winner or NO_PLAYER for a draw'
+
+    for ply in range(max_plies):
+
+        # Si la partida ya es tablas por repetición o por límite de jugadas, nadie tiene jugada
+        if engine.is_draw():
+            break
+
+        # Las primeras jugadas son al azar para que las partidas entre bots deterministas no se repitan
+        if ply < opening:
+            move = rng.choice(list(engine.legal_moves()))
+        else:
+            move = players[engine.position()[2]]()
+        if move is None:
+            break
+        player = engine.position()[2]
+        engine.make_move(move)
+        if engine.end():
+            return player
+    return NO_PLAYER
+
+
+def play_chunk(bot0, bot1, n_games, seed, max_plies, opening):
+    'Play n_games between two bots, alternating who starts; return (wins bot0, wins bot1, draws)'
+
+    rng = Random(seed)
+    wins0 = wins1 = draws = 0
+    for game in range(n_games):
+        if game % 2 == 0:
+            winner = play_game(bot0, bot1, rng, max_plies, opening)
+        else:
+            winner = play_game(bot1, bot0, rng, max_plies, opening)
+            winner = 1 - winner if winner != NO_PLAYER else NO_PLAYER
+        if winner == 0:
+            wins0 += 1
+        elif winner == 1:
+            wins1 += 1
+        else:
+            draws += 1
+    return wins0, wins1, draws
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Round-robin tournament between computer players.")
+    parser.add_argument('bots', nargs = '*',
+                        default = [name for name in BOTS if name != 'td' or os.path.exists(td_player.VALUE_FILE)],
+                        help = "players taking part, among " + ", ".join(BOTS) +
+                               " (default: all, td only once trained)")
+    parser.add_argument('--games', type = int, default = 100, help = "games per pair of players")
+    parser.add_argument('--chunk', type = int, default = 10, help = "games sent to a process at once")
+    parser.add_argument('--workers', type = int, default = None, help = "processes (default: all cores)")
+    parser.add_argument('--seed', type = int, default = 0, help = "seed of the random generators")
+    parser.add_argument('--max-plies', type = int, default = 200, help = "moves before a game is a draw")
+    parser.add_argument('--opening', type = int, default = 2, help = "random moves at the start of each game")
+    args = parser.parse_args()
+    for bot in args.bots:
+        if bot not in BOTS:
+            parser.error("unknown player " + bot)
+
+    # Puntos de cada jugador: victorias, derrotas y tablas
+    table = {bot: [0, 0, 0] for bot in args.bots}
+
+    # Repartimos las partidas de cada pareja en trozos; cada trozo tiene su propia semilla
+    tasks = []
+    for bot0, bot1 in combinations(args.bots, 2):
+        for start in range(0, args.games, args.chunk):
+            tasks.append((bot0, bot1, min(args.chunk, args.games - start), args.seed + len(tasks)))
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = {pool.submit(play_chunk, *task, args.max_plies, args.opening): task for task in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            bot0, bot1, _, _ = futures[future]
+            wins0, wins1, draws = future.result()
+            table[bot0][0] += wins0
+            table[bot0][1] += wins1
+            table[bot1][0] += wins1
+            table[bot1][1] += wins0
+            table[bot0][2] += draws
+            table[bot1][2] += draws
+
+            # Clasificación provisional cada vez que acaba un trozo
+            print("[%d/%d]" % (done, len(tasks)),
+                  "  ".join("%s %d-%d-%d" % (bot, *table[bot]) for bot in args.bots), flush = True)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,8 +6,116 @@ Text handling of a simple tic-tac-toe-like board, 2021.
 Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
 """
 
-# Import initialization of the separately programmed abstract board:
-from abs_board import set_board_up
+# Import the registry of separately programmed boards
+# and initialization of the computer player:
+from backends import BACKENDS, DEFAULT_BACKEND, board_up, set_game_up
+from ai_player import set_player_up
+
+# Optional measures of the board functions
+from metrics import Metrics
+
+# Import: DRAW, the end of game value of a drawn game
+from constants import DRAW
+
+import argparse
+import atexit
+import contextlib
+import io
+import sys
+
+# Optional arguments: player (0 or 1) moved by the computer; file of recorded games to replay
+parser = argparse.ArgumentParser(description = "Play on the text board, or replay recorded games.")
+parser.add_argument('ai_player', nargs = '?', type = int, choices = (0, 1), default = None,
+                    help = "player moved by the computer")
+parser.add_argument('--batch', metavar = 'FILE', default = None,
+                    help = "replay the games in FILE ('-' for standard input): one 'i j' answer per "
+                           "line, as typed when playing, and an empty line after each game")
+parser.add_argument('--no-draw', action = 'store_true', help = "in batch mode, do not draw the boards")
+parser.add_argument('--backend', choices = BACKENDS, default = DEFAULT_BACKEND,
+                    help = "board implementation to play on (default: %(default)s)")
+parser.add_argument('--metrics', metavar = 'FILE', default = None,
+                    help = "measure the board functions and save the measures to FILE at the end "
+                           "(Prometheus text if FILE ends in .prom, JSON otherwise)")
+args = parser.parse_args()
+ai_player = args.ai_player
+
+# Measures of the board functions, saved when the program ends
+metrics = Metrics() if args.metrics is not None else None
+if metrics is not None:
+    atexit.register(metrics.save, args.metrics)
+
+# Games replayed before each bulk write of the output
+BATCH_FLUSH = 1000
+
+def replay(lines, draw = True):
+    '''Replay the recorded games in lines through select_st() and move_st(),
+    and write the boards and the result of each game to standard output.'''
+
+    out = io.StringIO()
+    game = 0
+    pending = True
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+
+        # Una línea vacía separa las partidas
+        if not line:
+            if not pending:
+                report(out, game, moves, end, curr_player)
+                pending = True
+            continue
+
+        # Primera jugada de una partida: preparamos un tablero nuevo
+        if pending:
+            game += 1
+            stones, select_st, move_st, draw_txt = board_up(args.backend, metrics = metrics)
+            stone_selected, curr_player, end, moves = True, 0, False, 0
+            pending = False
+            if game % BATCH_FLUSH == 0:
+                sys.stdout.write(out.getvalue())
+                out = io.StringIO()
+
+        try:
+            i, j = map(int, line.split())
+        except ValueError:
+            out.write("Line %d: expected two coordinates, got %r\n" % (number, line))
+            continue
+        if end:
+            out.write("Line %d: game %d is already over\n" % (number, game))
+            continue
+
+        # Los mensajes del tablero (jugadas no válidas) van al mismo buffer que el resto
+        with contextlib.redirect_stdout(out):
+            if not stone_selected:
+                stone_selected = select_st(i, j)
+                if not stone_selected:
+                    print("Line %d: no stone of player %d at %d %d" % (number, curr_player, i, j))
+            else:
+                player = curr_player
+                stone_selected, curr_player, end = move_st(i, j)
+                if curr_player == player:
+                    print("Line %d: player %d cannot move to %d %d" % (number, player, i, j))
+                else:
+                    moves += 1
+                    if draw:
+                        draw_txt(end)
+
+    if not pending:
+        report(out, game, moves, end, curr_player)
+    sys.stdout.write(out.getvalue())
+
+def report(out, game, moves, end, curr_player):
+    'write the result of a replayed game'
+    if end == DRAW:
+        out.write("Game %d: draw after %d moves\n" % (game, moves))
+    elif end:
+        out.write("Game %d: player %d wins after %d moves\n" % (game, 1 - curr_player, moves))
+    else:
+        out.write("Game %d: unfinished after %d moves\n" % (game, moves))
+
+if args.batch is not None:
+    with (open(args.batch) if args.batch != '-' else contextlib.nullcontext(sys.stdin)) as f:
+        replay(f, not args.no_draw)
+    sys.exit()
 
 # Prepare board:
 # this will set up all stones as unplayed, select a first stone to play,
@@ -19,26 +127,42 @@ from abs_board import set_board_up
 #     stone there, changes player, unselects the stone and checks for 
 #     end of game; otherwise, does nothing, leaving the stone selected;
 #     returns: bool "stone still selected", next player (may be the same), 
-#     and bool "end of game"
+#     and bool "end of game" (DRAW if the game is drawn)
 #   the call to draw_txt(end) prints a text-based version of the board
-stones, select_st, move_st, draw_txt = set_board_up()
+# The engine follows the game on any backend, for the computer player
+engine, stones, select_st, move_st, draw_txt = set_game_up(args.backend, metrics = metrics)
 
-# set_board_up() already selects a first stone
+# the call choose_move() returns the move of the computer as (src, dst),
+# src being None while there are stones to place
+choose_move = set_player_up(engine)
+
+# set_board_up() already selects a first stone; set curr_player to zero.
 stone_selected = True
+curr_player = 0
 
 # Loop until game ends
 end = False
 draw_txt(False)
 
 while not end:
+    if curr_player == ai_player:
+        src, dst = choose_move()
+        if src is not None:
+            select_st(*src)
+        print("Computer plays", *dst)
+        stone_selected, curr_player, end = move_st(*dst)
+        draw_txt(end)
+        continue
     while not stone_selected:
         i, j = input("Select stone coordinates: ").split()
         stone_selected = select_st(int(i), int(j))
         draw_txt(end)
-    while stone_selected and not end:
+    while stone_selected and not end and curr_player != ai_player:
         i, j = input("Select destination coordinates: ").split()
         stone_selected, curr_player, end = move_st(int(i), int(j))
         draw_txt(end)
 
 # Wait for the user to look at the screen before ending the program.
+if end == DRAW:
+    print("\nDraw.")
 input('\nGame over.') 
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Computer player for the abstract board based on Monte Carlo tree search:
+it plays random games from the current position for as long as its time
+budget allows, keeps the tree between moves and can add the statistics
+of independent searches run by other processes.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: NO_PLAYER
+from constants import NO_PLAYER
+
+# Import initialization of the abstract board, for the searches in other processes
+from abs_board import set_engine_up
+
+# Opening book with the best placements (built with python opening_book.py)
+from opening_book import set_book_up, BOOK_FILE
+
+from concurrent.futures import ProcessPoolExecutor
+from math import log, sqrt
+from random import Random
+from time import perf_counter
+
+
+class Node:
+    'Node of the search tree: position reached by playing move from its parent'
+
+    __slots__ = ('move', 'parent', 'mover', 'position', 'terminal', 'children', 'untried',
+                 'visits', 'wins')
+
+    def __init__(self, move, parent, mover, position, terminal, untried):
+        self.move = move
+        self.parent = parent
+
+        # Jugador que ha hecho la jugada; wins cuenta sus victorias (las tablas valen 0.5)
+        self.mover = mover
+        self.position = position
+        self.terminal = terminal
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+
+def new_root(engine):
+    'Fresh tree for the current position of engine'
+    pos = engine.position()
+    return Node(None, None, 1 - pos[2], pos, engine.end(), list(engine.legal_moves()))
+
+
+def grow(engine, root, time_limit, rng, exploration, max_playout):
+    'Run simulations from root, the current position of engine, for time_limit seconds (at least one)'
+
+    make_move, unmake_move, legal_moves, end, position = (
+        engine.make_move, engine.unmake_move, engine.legal_moves, engine.end, engine.position)
+
+    deadline = perf_counter() + time_limit
+    while True:
+        node = root
+        depth = 0
+
+        # Selección: bajamos por el hijo con mejor valor UCT mientras el nodo esté totalmente expandido
+        while not node.untried and node.children and not node.terminal:
+            log_visits = log(node.visits)
+            node = max(node.children, key = lambda child: child.wins / child.visits
+                       + exploration * sqrt(log_visits / child.visits))
+            make_move(node.move)
+            depth += 1
+
+        # Expansión: añadimos un hijo con una jugada aún no probada
+        if node.untried and not node.terminal:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            mover = position()[2]
+            make_move(move)
+            depth += 1
+            terminal = end()
+            child = Node(move, node, mover, position(), terminal, [] if terminal else list(legal_moves()))
+            node.children.append(child)
+            node = child
+
+        # Partida al azar hasta el final (o hasta max_playout jugadas, que cuentan como tablas)
+        if node.terminal:
+            winner = node.mover
+        else:
+            winner = NO_PLAYER
+            for _ in range(max_playout):
+                moves = list(legal_moves())
+                if not moves:
+                    break
+                player = position()[2]
+                make_move(rng.choice(moves))
+                depth += 1
+                if end():
+                    winner = player
+                    break
+
+        for _ in range(depth):
+            unmake_move()
+
+        # Actualizamos las estadísticas del camino hasta la raíz
+        while node is not None:
+            node.visits += 1
+            if winner == node.mover:
+                node.wins += 1
+            elif winner == NO_PLAYER:
+                node.wins += 0.5
+            node = node.parent
+
+        if perf_counter() >= deadline:
+            break
+
+
+def search(moves, left, time_limit, exploration, max_playout, seed):
+    '''Search with a new tree from the position reached by moves, with left
+    stones still to place; return the visits of each move of the root.'''
+
+    # Las piedras por jugador son las que se han colocado más las que quedan, entre dos
+    placements = sum(1 for move in moves if move[0] is None)
+    engine = set_engine_up((placements + left) // 2)
+    for move in moves:
+        engine.make_move(move)
+
+    root = new_root(engine)
+    grow(engine, root, time_limit, Random(seed), exploration, max_playout)
+    return [(child.move, child.visits) for child in root.children]
+
+
+def set_player_up(engine, time_limit = 0.5, workers = 1, exploration = 1.4, max_playout = 100,
+                  seed = None, book_file = BOOK_FILE):
+    '''Prepare a Monte Carlo player for the given engine (from abs_board.set_engine_up());
+    return a function that chooses the move, in make_move() format, of the current
+    player after searching for time_limit seconds. With workers > 1, as many
+    searches run at once in separate processes and their statistics are added up;
+    choose_move.close() stops those processes once the game is over.
+    If the opening book book_file exists, placements are read from it.'''
+
+    position = engine.position
+    rng = Random(seed)
+
+    # El libro de aperturas solo se lee si se llega a consultar
+    book_move = set_book_up(book_file) if book_file is not None else None
+
+    # Raíz del árbol: se conserva entre jugadas si la partida sigue por una rama ya explorada
+    root = None
+
+    # Procesos para las búsquedas en paralelo, creados la primera vez que hacen falta
+    pool = None
+
+
+    def find_root():
+        'Node of the current position in the kept tree, or a new one'
+
+        pos = position()
+        if root is not None:
+            if root.position == pos:
+                return root
+            for child in root.children:
+                if child.position == pos:
+                    child.parent = None
+                    child.move = None
+                    return child
+        return new_root(engine)
+
+
+    def choose_move():
+
+        '''
+        Return the move chosen for the current player, or None if there is none.
+        '''
+
+        nonlocal root, pool
+
+        root = find_root()
+        if root.terminal or not (root.untried or root.children):
+            return None
+
+        if book_move is not None:
+            move = book_move(*position())
+            if move is not None:
+                return move
+
+        # Lanzamos las búsquedas de los otros procesos desde la misma posición
+        futures = []
+        if workers > 1:
+            if pool is None:
+                pool = ProcessPoolExecutor(workers - 1)
+            moves = engine.game_moves()
+            futures = [pool.submit(search, moves, position()[3], time_limit, exploration,
+                                   max_playout, rng.getrandbits(32))
+                       for _ in range(workers - 1)]
+
+        grow(engine, root, time_limit, rng, exploration, max_playout)
+
+        # Visitas de cada jugada, sumando las de todas las búsquedas
+        visits = {child.move: child.visits for child in root.children}
+        for future in futures:
+            for move, n in future.result():
+                visits[move] = visits.get(move, 0) + n
+
+        best = max(visits, key = visits.get)
+
+        # Nos quedamos con el subárbol de la jugada elegida para la próxima vez
+        for child in root.children:
+            if child.move == best:
+                root = child
+                break
+        else:
+            root = None
+        return best
+
+
+    def close():
+        'Stop the processes of the parallel searches, if any; they are created again if needed'
+        nonlocal pool
+        if pool is not None:
+            pool.shutdown()
+            pool = None
+
+
+    choose_move.close = close
+    return choose_move
@@ -0,0 +1,120 @@
+"""
+Optional instrumentation of the board functions: number of calls, calls
+that were rejected and a histogram of the time per call, exported as JSON
+or in the Prometheus text format. The functions are wrapped only when a
+Metrics object is given, so an uninstrumented board runs at full speed.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+from bisect import bisect_left
+import json
+from time import perf_counter_ns
+
+# Límites superiores de los intervalos del histograma, en nanosegundos (de 1 us a 1 s)
+BOUNDS = tuple(base * 10**exp for exp in range(3, 9) for base in (1, 2, 5)) + (10**9,)
+
+
+class Metrics:
+    'Counters and time histograms of the instrumented board functions, by name'
+
+    def __init__(self):
+        self.calls = {}
+        self.rejected = {}
+        self.total_ns = {}
+
+        # histogram[name][k]: llamadas que han tardado como mucho BOUNDS[k]; la última casilla, más
+        self.histogram = {}
+
+    def timed(self, name, function, rejected = None):
+
+        '''
+        Wrap function so that every call is counted and timed under name.
+        rejected, if given, is called with the result and tells whether
+        the call was rejected.
+        '''
+
+        self.calls.setdefault(name, 0)
+        self.rejected.setdefault(name, 0)
+        self.total_ns.setdefault(name, 0)
+        histogram = self.histogram.setdefault(name, [0] * (len(BOUNDS) + 1))
+        calls, failed, total_ns = self.calls, self.rejected, self.total_ns
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            result = function(*args, **kwargs)
+            elapsed = perf_counter_ns() - start
+            calls[name] += 1
+            total_ns[name] += elapsed
+            histogram[bisect_left(BOUNDS, elapsed)] += 1
+            if rejected is not None and rejected(result):
+                failed[name] += 1
+            return result
+
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    def board(self, stones, select_st, move_st, draw_txt):
+
+        '''
+        Instrument the 4 functions of a board from set_board_up() and return
+        them. A move_st() call is rejected when the player stays the same.
+        '''
+
+        # Jugador que devolvió la última llamada a move_st(): si no cambia, la jugada no era válida
+        player = 0
+
+        def same_player(result):
+            nonlocal player
+            rejected = result[1] == player
+            player = result[1]
+            return rejected
+
+        return (stones, self.timed('select_st', select_st, lambda result: not result),
+                self.timed('move_st', move_st, same_player), self.timed('draw_txt', draw_txt))
+
+    def as_dict(self):
+        'All the measures, by function name'
+        result = {}
+        for name, calls in self.calls.items():
+            result[name] = {
+                'calls': calls,
+                'rejected': self.rejected[name],
+                'seconds': self.total_ns[name] / 1e9,
+                'histogram': {('%g' % (bound / 1e9)): count
+                              for bound, count in zip(BOUNDS + (float('inf'),), self.histogram[name])},
+            }
+
+        # Comprobaciones de KROW en raya por cada llamada a move_st()
+        if self.calls.get('move_st') and 'end' in self.calls:
+            result['win_checks_per_move'] = self.calls['end'] / self.calls['move_st']
+        return result
+
+    def to_json(self):
+        'The measures as a JSON document'
+        return json.dumps(self.as_dict(), indent = 2)
+
+    def to_prometheus(self, prefix = 'pa1_board'):
+        'The measures in the Prometheus text exposition format'
+        lines = ["# TYPE %s_calls_total counter" % prefix]
+        lines += ['%s_calls_total{function="%s"} %d' % (prefix, name, calls)
+                  for name, calls in self.calls.items()]
+        lines.append("# TYPE %s_rejected_total counter" % prefix)
+        lines += ['%s_rejected_total{function="%s"} %d' % (prefix, name, rejected)
+                  for name, rejected in self.rejected.items()]
+        lines.append("# TYPE %s_call_seconds histogram" % prefix)
+        for name, histogram in self.histogram.items():
+            cumulative = 0
+            for bound, count in zip(BOUNDS, histogram):
+                cumulative += count
+                lines.append('%s_call_seconds_bucket{function="%s",le="%g"} %d'
+                             % (prefix, name, bound / 1e9, cumulative))
+            lines.append('%s_call_seconds_bucket{function="%s",le="+Inf"} %d'
+                         % (prefix, name, self.calls[name]))
+            lines.append('%s_call_seconds_sum{function="%s"} %.9f' % (prefix, name, self.total_ns[name] / 1e9))
+            lines.append('%s_call_seconds_count{function="%s"} %d' % (prefix, name, self.calls[name]))
+        return "\n".join(lines) + "\n"
+
+    def save(self, path):
+        'Write the measures to path: Prometheus text if it ends in .prom, JSON otherwise'
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus() if path.endswith('.prom') else self.to_json())
@@ -0,0 +1,172 @@
+"""
+Opening book for the placement phase: every position with stones still
+to place is solved once, offline, with the tablebase giving the value of
+the positions where the movement phase starts, and the best placement is
+saved as one byte per position. Symmetric positions are solved only once.
+The book is read the first time a move is asked for.
+Usage: python opening_book.py [file]
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, stones in a row to win KROW, stones per player ST_PLAYER
+from constants import BSIZ, KROW, ST_PLAYER
+
+# Winning lines through each square, numbering and symmetries of the positions, and the
+# solved movement phase
+from bit_board import MASKS_THROUGH
+from pos_index import set_index_up, canonical, N_CELLS
+import tablebase
+
+import mmap
+import os
+import struct
+import sys
+
+# Fichero por defecto
+BOOK_FILE = 'opening_book.bin'
+
+# Cabecera del fichero: identificador, versión, BSIZ, KROW y piedras por jugador
+MAGIC = b'PA1B'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBB')
+
+# Valor de las posiciones sin jugada en el libro (la partida ya ha acabado)
+NO_MOVE = 255
+
+# Puntuación de una posición ganada ya: se le resta la distancia para preferir ganar antes
+SCALE = 1 << tablebase.DIST_BITS
+
+
+def _placement_size(rank, stones_per_player):
+    'Number of positions with stones still to place: they come first in the pos_index numbering'
+    first0 = (1 << stones_per_player) - 1
+    first1 = (1 << 2*stones_per_player) - 1 ^ first0
+    return rank(first0, first1, 0, 0)
+
+
+def _completes_line(mask, k):
+    'Whether the stone on square k makes a full line in mask'
+    for line in MASKS_THROUGH[k // BSIZ][k % BSIZ]:
+        if mask & line == line:
+            return True
+    return False
+
+
+def solve(stones_per_player = ST_PLAYER):
+
+    '''
+    Best placement for every position of the placement phase. Return a
+    bytearray indexed by pos_index rank() with the square k = i*BSIZ + j
+    to place the next stone on, or NO_MOVE if the game is already over.
+    '''
+
+    size, rank, unrank = set_index_up(stones_per_player)
+    n_positions = _placement_size(rank, stones_per_player)
+    table = tablebase.solve(stones_per_player)
+    _, entry, _ = tablebase.set_entries_up(stones_per_player)
+    full = (1 << N_CELLS) - 1
+
+    # Puntuación de cada posición ya resuelta, según la menor de sus 8 imágenes simétricas
+    memo = {}
+
+    def score(mask0, mask1, player, left):
+        'Value of the position for player: SCALE - d if he wins in d moves, -(SCALE - d) if he loses, 0 if drawn'
+
+        # Todas las piedras colocadas: lo dice la tablebase
+        if left == 0:
+            value = table[entry(mask0, mask1, player)]
+            result, dist = value >> tablebase.DIST_BITS, value & tablebase.DIST_MASK
+            return SCALE - dist if result == tablebase.WIN else dist - SCALE if result == tablebase.LOSS else 0
+
+        key = canonical(mask0, mask1)
+        if key not in memo:
+            memo[key] = max(child_score(mask0, mask1, player, left, low)
+                            for low in _squares(full & ~(mask0 | mask1)))
+        return memo[key]
+
+    def child_score(mask0, mask1, player, left, low):
+        'Value for player of placing a stone on the square with bit low'
+        masks = [mask0, mask1]
+        masks[player] |= low
+        if _completes_line(masks[player], low.bit_length() - 1):
+            return SCALE - 1
+        value = -score(masks[0], masks[1], 1 - player, left - 1)
+
+        # Una jugada más hasta el final
+        return value - 1 if value > 0 else value + 1 if value < 0 else 0
+
+    book = bytearray([NO_MOVE]) * n_positions
+    for idx in range(n_positions):
+        mask0, mask1, player, left = unrank(idx)
+
+        # Si alguien ya ha hecho línea, la partida ha acabado y no hay jugada
+        if any(_completes_line(mask, k) for mask in (mask0, mask1) for k in range(N_CELLS) if mask >> k & 1):
+            continue
+        best = max(_squares(full & ~(mask0 | mask1)),
+                   key = lambda low: (child_score(mask0, mask1, player, left, low), -low))
+        book[idx] = best.bit_length() - 1
+    return book
+
+
+def _squares(mask):
+    'Single-bit masks of the squares in mask'
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+
+def write(path = BOOK_FILE, stones_per_player = ST_PLAYER):
+    'Solve the placement phase and save the book to path'
+    book = solve(stones_per_player)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BSIZ, KROW, stones_per_player))
+        f.write(book)
+
+
+def set_book_up(path = BOOK_FILE):
+
+    '''
+    Return a function book_move(mask0, mask1, player, left) that gives the
+    placement of the book, in make_move() format, for a position as
+    engine.position() returns it, or None if the book has no move for it.
+    The file is mapped in memory the first time a move is asked for; if
+    it does not exist, book_move() always returns None.
+    '''
+
+    # Contenido del libro y numeración de sus posiciones, que se cargan en la primera consulta
+    data = None
+    rank = None
+    stones_per_player = 0
+
+    def load():
+        nonlocal data, rank, stones_per_player
+        if not os.path.exists(path):
+            data = b''
+            return
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, bsiz, krow, stones_per_player = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or bsiz != BSIZ or krow != KROW:
+            raise ValueError(path + " is not an opening book for this board")
+        _, rank, _ = set_index_up(stones_per_player)
+
+    def book_move(mask0, mask1, player, left):
+        'Placement of the book for the position, or None'
+
+        if data is None:
+            load()
+        if not data or left == 0:
+            return None
+
+        # El libro es para partidas con su número de piedras por jugador
+        if bin(mask0).count('1') + bin(mask1).count('1') + left != 2 * stones_per_player:
+            return None
+        k = data[HEADER.size + rank(mask0, mask1, player, left)]
+        return None if k == NO_MOVE else (None, divmod(k, BSIZ))
+
+    return book_move
+
+
+if __name__ == '__main__':
+    write(sys.argv[1] if len(sys.argv) > 1 else BOOK_FILE)
@@ -0,0 +1,139 @@
+"""
+Dense numbering of the board positions: rank() turns a position into an
+integer between 0 and size - 1 and unrank() gives the position back, so
+values per position can be kept in flat arrays instead of dictionaries.
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, stones per player ST_PLAYER
+from constants import BSIZ, ST_PLAYER
+
+N_CELLS = BSIZ * BSIZ
+
+# Números combinatorios: BINOM[n][k] = C(n, k)
+BINOM = [[0] * (N_CELLS + 1) for _ in range(N_CELLS + 1)]
+for _n in range(N_CELLS + 1):
+    BINOM[_n][0] = 1
+    for _k in range(1, _n + 1):
+        BINOM[_n][_k] = BINOM[_n - 1][_k - 1] + BINOM[_n - 1][_k]
+
+# Las 8 simetrías del tablero cuadrado: SYM[s][k] es la casilla a la que va la casilla k = i*BSIZ + j
+_N = BSIZ - 1
+SYM = tuple(
+    tuple(i*BSIZ + j for i, j in (f(i, j) for i in range(BSIZ) for j in range(BSIZ)))
+    for f in (
+        lambda i, j: (i, j),       lambda i, j: (j, _N - i),
+        lambda i, j: (_N - i, _N - j), lambda i, j: (_N - j, i),
+        lambda i, j: (i, _N - j),  lambda i, j: (_N - i, j),
+        lambda i, j: (j, i),       lambda i, j: (_N - j, _N - i),
+    ))
+
+
+def transform(mask, s):
+    'Mask of the squares of mask under symmetry s'
+    image = 0
+    while mask:
+        low = mask & -mask
+        image |= 1 << SYM[s][low.bit_length() - 1]
+        mask ^= low
+    return image
+
+
+def canonical(mask0, mask1):
+    'The same position for all 8 symmetric ones: the least (mask0, mask1) among their images'
+    return min((transform(mask0, s), transform(mask1, s)) for s in range(8))
+
+
+def _rank_subset(cells):
+    'Colex rank of an increasing sequence of cell numbers among subsets of its size'
+    return sum(BINOM[c][k] for k, c in enumerate(cells, 1))
+
+
+def _unrank_subset(r, k, n):
+    'Increasing sequence of k cells among range(n) with colex rank r'
+    cells = []
+    c = n - 1
+    while k > 0:
+        while BINOM[c][k] > r:
+            c -= 1
+        cells.append(c)
+        r -= BINOM[c][k]
+        k -= 1
+        c -= 1
+    cells.reverse()
+    return cells
+
+
+def set_index_up(stones_per_player = ST_PLAYER):
+
+    '''
+    Prepare the numbering of the positions of a game with stones_per_player
+    stones each. A position is given as engine.position() returns it:
+    stone masks of both players, player to move, stones left to place.
+    Return 3 values: number of positions, function rank(mask0, mask1,
+    player, left) and function unrank(idx).
+    '''
+
+    # Las posiciones se agrupan en bloques según las piedras que quedan por colocar. Mientras
+    # se colocan piedras, el jugador que mueve depende de cuántas se han colocado; después,
+    # hay un bloque para cada jugador. Cada bloque tiene C(N_CELLS, n0) * C(N_CELLS - n0, n1)
+    # posiciones, siendo n0 y n1 las piedras de cada jugador en el tablero
+    total = 2 * stones_per_player
+    blocks = {}
+    size = 0
+    for left in range(total, -1, -1):
+        placed = total - left
+        n0, n1 = (placed + 1) // 2, placed // 2
+        for player in ((placed % 2,) if left > 0 else (0, 1)):
+            blocks[left, player] = (size, n0, n1)
+            size += BINOM[N_CELLS][n0] * BINOM[N_CELLS - n0][n1]
+
+    # Bloques ordenados por su inicio, para unrank()
+    starts = sorted((start, key) for key, (start, _, _) in blocks.items())
+
+
+    def rank(mask0, mask1, player, left):
+        'Number of the position, between 0 and size - 1'
+
+        start, n0, n1 = blocks[left, player]
+
+        # Casillas del jugador 0, y las del jugador 1 numeradas entre las casillas que quedan libres
+        cells0 = []
+        cells1 = []
+        free = 0
+        for c in range(N_CELLS):
+            if mask0 >> c & 1:
+                cells0.append(c)
+            else:
+                if mask1 >> c & 1:
+                    cells1.append(free)
+                free += 1
+
+        return start + _rank_subset(cells0) * BINOM[N_CELLS - n0][n1] + _rank_subset(cells1)
+
+
+    def unrank(idx):
+        'Position with number idx, as (mask0, mask1, player, left)'
+
+        # Buscamos el bloque que contiene idx
+        lo, hi = 0, len(starts) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if starts[mid][0] <= idx:
+                lo = mid
+            else:
+                hi = mid - 1
+        start, (left, player) = starts[lo]
+        _, n0, n1 = blocks[left, player]
+
+        r0, r1 = divmod(idx - start, BINOM[N_CELLS - n0][n1])
+        cells0 = _unrank_subset(r0, n0, N_CELLS)
+        mask0 = sum(1 << c for c in cells0)
+
+        # Las casillas del jugador 1 están numeradas entre las que no son del jugador 0
+        free_cells = [c for c in range(N_CELLS) if not mask0 >> c & 1]
+        mask1 = sum(1 << free_cells[f] for f in _unrank_subset(r1, n1, N_CELLS - n0))
+        return mask0, mask1, player, left
+
+
+    return size, rank, unrank
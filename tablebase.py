@@ -0,0 +1,185 @@
+"""
+Tablebase for the movement phase, once all stones have been placed:
+retrograde analysis labels every position as won, lost or drawn for the
+player to move, with the number of moves until the end, and saves it to
+a binary file that is read through mmap, without parsing it.
+Usage: python tablebase.py [file]
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: board dimension BSIZ, stones in a row to win KROW, stones per player ST_PLAYER
+from constants import BSIZ, KROW, ST_PLAYER
+
+# Masks of the winning lines and dense numbering of the positions
+from bit_board import LINES
+from pos_index import set_index_up, N_CELLS
+
+from array import array
+from collections import deque
+import mmap
+import struct
+import sys
+
+# Fichero por defecto
+TB_FILE = 'tablebase.bin'
+
+# Cabecera del fichero: identificador, versión, BSIZ, KROW y piedras por jugador
+MAGIC = b'PA1T'
+VERSION = 3
+HEADER = struct.Struct('<4sBBBB')
+
+# Resultado para el jugador al que le toca mover; ILLEGAL para posiciones imposibles
+DRAW, WIN, LOSS, ILLEGAL = 0, 1, 2, 3
+
+# Cada entrada ocupa 16 bits: los 2 de arriba son el resultado, los otros 14 la distancia al final
+DIST_BITS = 14
+DIST_MASK = (1 << DIST_BITS) - 1
+
+
+def _aligned(mask):
+    'Whether the stones in mask include a full line'
+    for line in LINES:
+        if mask & line == line:
+            return True
+    return False
+
+
+def _bits(mask):
+    'Single-bit masks of the squares in mask'
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+
+def set_entries_up(stones_per_player = ST_PLAYER):
+
+    '''
+    Numbering of the positions with every stone placed. Return 3 values: 
+    number of positions, function entry(mask0, mask1, player) and 
+    function position(idx) that gives (mask0, mask1, player) back.
+    '''
+
+    size, rank, unrank = set_index_up(stones_per_player)
+
+    # Con todas las piedras colocadas, las posiciones son los dos últimos bloques de pos_index, 
+    # uno para cada jugador. El primero empieza con las piedras en las primeras casillas
+    first0 = (1 << stones_per_player) - 1
+    first1 = (1 << 2*stones_per_player) - 1 ^ first0
+    start = rank(first0, first1, 0, 0)
+
+    def entry(mask0, mask1, player):
+        'Number of the position'
+        return rank(mask0, mask1, player, 0) - start
+
+    def position(idx):
+        'Position with number idx'
+        return unrank(start + idx)[:3]
+
+    return size - start, entry, position
+
+
+def solve(stones_per_player = ST_PLAYER):
+
+    '''
+    Retrograde analysis of all positions with every stone placed.
+    Return an array of 16-bit entries, numbered as entry() does.
+    '''
+
+    size, entry, position = set_entries_up(stones_per_player)
+    full = (1 << N_CELLS) - 1
+    table = array('H', [ILLEGAL << DIST_BITS]) * size
+
+    # Jugadas que aún no se han visto perdedoras en cada posición sin resolver
+    moves_left = array('H', [0]) * size
+
+    # Cola de posiciones resueltas, en orden de distancia al final
+    queue = deque()
+
+    for idx in range(size):
+        mask0, mask1, player = position(idx)
+        aligned = (_aligned(mask0), _aligned(mask1))
+
+        # El jugador anterior acaba de hacer KROW en raya: la partida está perdida
+        if aligned[1 - player] and not aligned[player]:
+            table[idx] = LOSS << DIST_BITS
+            queue.append(idx)
+
+        # Si no hay ninguna línea la posición es legal; de momento, tablas
+        elif not aligned[player]:
+            table[idx] = DRAW << DIST_BITS
+            moves_left[idx] = stones_per_player * bin(full & ~(mask0 | mask1)).count('1')
+
+    while queue:
+        idx = queue.popleft()
+        mask0, mask1, player = position(idx)
+        result, dist = table[idx] >> DIST_BITS, table[idx] & DIST_MASK
+
+        # Posiciones anteriores: el otro jugador ha movido una de sus piedras desde una casilla vacía
+        mover = 1 - player
+        masks = [mask0, mask1]
+        empty = full & ~(mask0 | mask1)
+        for to in _bits(masks[mover]):
+            for frm in _bits(empty):
+                masks[mover] ^= to | frm
+                prev = entry(masks[0], masks[1], mover)
+                if moves_left[prev] > 0:
+
+                    # Si se puede llegar a una posición perdida para el rival, la anterior está ganada
+                    if result == LOSS:
+                        moves_left[prev] = 0
+                        table[prev] = WIN << DIST_BITS | dist + 1
+                        queue.append(prev)
+
+                    # Si todas las jugadas llevan a posiciones ganadas por el rival, está perdida
+                    else:
+                        moves_left[prev] -= 1
+                        if moves_left[prev] == 0:
+                            table[prev] = LOSS << DIST_BITS | dist + 1
+                            queue.append(prev)
+                masks[mover] ^= to | frm
+
+    return table
+
+
+def write(path = TB_FILE, stones_per_player = ST_PLAYER):
+    'Solve the movement phase and save the tablebase to path'
+    table = solve(stones_per_player)
+    if sys.byteorder != 'little':
+        table.byteswap()
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BSIZ, KROW, stones_per_player))
+        table.tofile(f)
+
+
+def open_tablebase(path = TB_FILE):
+
+    '''
+    Map the tablebase file in memory and return a function
+    probe(mask0, mask1, player) that gives the result for the player
+    to move (DRAW, WIN, LOSS or ILLEGAL) and the moves until the end.
+    '''
+
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    magic, version, bsiz, krow, stones_per_player = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or bsiz != BSIZ or krow != KROW:
+        raise ValueError(path + " is not a tablebase for this board")
+    _, entry, _ = set_entries_up(stones_per_player)
+    value16 = struct.Struct('<H')
+    base = HEADER.size
+
+    def probe(mask0, mask1, player):
+        'Result and distance to the end for the player to move'
+
+        # Solo están las posiciones con todas las piedras colocadas
+        if bin(mask0).count('1') != stones_per_player or bin(mask1).count('1') != stones_per_player:
+            return ILLEGAL, 0
+        value, = value16.unpack_from(data, base + 2*entry(mask0, mask1, player))
+        return value >> DIST_BITS, value & DIST_MASK
+
+    return probe
+
+
+if __name__ == '__main__':
+    write(sys.argv[1] if len(sys.argv) > 1 else TB_FILE)
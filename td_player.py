@@ -0,0 +1,180 @@
+"""
+Computer player that learns by playing against itself: the value of every
+position for the player to move is kept in a flat NumPy array, numbered
+with pos_index, and after each batch of games it is moved towards the
+value of the position that followed (temporal difference learning). The
+table is saved as a .npy file from time to time and the player chooses
+the move that leads to the best position according to it.
+Usage: python td_player.py [-h] [--games N] [--batch N] [--alpha A] [--epsilon E] ... [file]
+Intended for Grau en Intel-ligencia Artificial, Programacio i Algorismes 1.
+"""
+
+# Import: stones per player ST_PLAYER
+from constants import ST_PLAYER
+
+# Import initialization of the abstract board and the numbering of the positions
+from abs_board import set_engine_up
+from pos_index import set_index_up
+
+import argparse
+from array import array
+import os
+from random import Random
+
+import numpy as np
+
+# Fichero por defecto de la tabla de valores
+VALUE_FILE = 'td_values.npy'
+
+
+def save_values(values, path = VALUE_FILE):
+    'Write the table to path, replacing the previous one only once it is complete'
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, values)
+    os.replace(path + '.tmp', path)
+
+
+def load_values(path = VALUE_FILE, stones_per_player = ST_PLAYER):
+    'Table of values saved in path, checking that it numbers the positions of this game'
+    values = np.load(path, mmap_mode = 'r')
+    size, _, _ = set_index_up(stones_per_player)
+    if values.shape != (size,):
+        raise ValueError(path + " is not a table of values for this board")
+    return values
+
+
+def train(n_games, values = None, stones_per_player = ST_PLAYER, alpha = 0.1, epsilon = 0.1,
+          batch = 256, checkpoint = 10000, path = VALUE_FILE, seed = None, report = None):
+
+    '''
+    Play n_games games of the computer against itself and learn from them.
+    Each move is the best one according to values, or a random one with
+    probability epsilon. The moves of a batch of games are kept as three
+    arrays of integers: position before the move, position after it (-1
+    if the game ended) and result for the player who moved. At the end of
+    the batch every position is moved a fraction alpha towards the value
+    that follows it, averaged over its appearances in the batch. The table
+    is saved to path every checkpoint games (if path is not None) and
+    report(games, error), if given, is called with the mean difference
+    between the values and their targets. Return the table, a new one of
+    zeros if values is None.
+    '''
+
+    size, rank, _ = set_index_up(stones_per_player)
+    if values is None:
+        values = np.zeros(size, dtype = np.float32)
+    engine = set_engine_up(stones_per_player)
+    make_move, unmake_move, legal_moves, end, is_draw, position = (
+        engine.make_move, engine.unmake_move, engine.legal_moves, engine.end, engine.is_draw, engine.position)
+    rng = Random(seed)
+
+    played = 0
+    while played < n_games:
+
+        # Jugadas del lote: posición antes, posición después (o -1) y resultado para quien ha movido
+        before, after, reward = array('q'), array('q'), array('b')
+        for _ in range(min(batch, n_games - played)):
+            idx = rank(*position())
+            n_moves = 0
+            while True:
+                moves = list(legal_moves())
+                if not moves:
+                    break
+
+                # Valoramos todas las jugadas: ganar vale 1, tablas 0, si no, lo contrario del valor para el rival
+                best, best_value, best_next = None, -float('inf'), -1
+                explore = rng.random() < epsilon
+                for move in (rng.choice(moves),) if explore else moves:
+                    make_move(move)
+                    if end():
+                        value, nxt = 1.0, -1
+                    elif is_draw():
+                        value, nxt = 0.0, -1
+                    else:
+                        nxt = rank(*position())
+                        value = -float(values[nxt])
+                    unmake_move()
+                    if value > best_value:
+                        best, best_value, best_next = move, value, nxt
+
+                make_move(best)
+                n_moves += 1
+                before.append(idx)
+                after.append(best_next)
+                reward.append(1 if best_next < 0 and best_value > 0 else 0)
+                idx = best_next
+
+            # Volvemos a la posición inicial para la siguiente partida
+            for _ in range(n_moves):
+                unmake_move()
+            played += 1
+
+        # Actualización de todo el lote a la vez: cada posición se corrige con la media de sus errores,
+        # para que las que se repiten mucho no se pasen de largo
+        states = np.frombuffer(before, dtype = np.int64)
+        nexts = np.frombuffer(after, dtype = np.int64)
+        targets = np.where(nexts >= 0, -values[np.maximum(nexts, 0)], np.frombuffer(reward, dtype = np.int8))
+        error = targets - values[states]
+        unique, inverse = np.unique(states, return_inverse = True)
+        values[unique] += (alpha * np.bincount(inverse, weights = error) / np.bincount(inverse)).astype(values.dtype)
+
+        if report is not None:
+            report(played, float(np.abs(error).mean()) if len(error) else 0.0)
+        if path is not None and (played % checkpoint < batch or played == n_games):
+            save_values(values, path)
+    return values
+
+
+def set_player_up(engine, value_file = VALUE_FILE):
+    '''Prepare a player for the given engine (from abs_board.set_engine_up()) that
+    chooses the move leading to the position with the best learned value; return
+    the function that chooses the move, in make_move() format, of the current player.
+    The table is read from value_file, made with python td_player.py.'''
+
+    make_move, unmake_move, legal_moves, end, is_draw, position = (
+        engine.make_move, engine.unmake_move, engine.legal_moves, engine.end, engine.is_draw, engine.position)
+    mask0, mask1, _, left = position()
+    stones_per_player = (bin(mask0).count('1') + bin(mask1).count('1') + left) // 2
+    _, rank, _ = set_index_up(stones_per_player)
+    values = load_values(value_file, stones_per_player)
+
+    def choose_move(stop = None):
+        'Return the move chosen for the current player, or None if there is none'
+
+        # stop se acepta para poder usarlo como ai_player, pero la elección es inmediata
+        best, best_value = None, -float('inf')
+        for move in legal_moves():
+            make_move(move)
+            value = 1.0 if end() else 0.0 if is_draw() else -float(values[rank(*position())])
+            unmake_move()
+            if value > best_value:
+                best, best_value = move, value
+        return best
+
+    return choose_move
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Train the table of values by self-play.")
+    parser.add_argument('file', nargs = '?', default = VALUE_FILE,
+                        help = "table of values, continued if it exists (default: %(default)s)")
+    parser.add_argument('--games', type = int, default = 100000, help = "games to play")
+    parser.add_argument('--batch', type = int, default = 256, help = "games between updates of the table")
+    parser.add_argument('--alpha', type = float, default = 0.1, help = "learning rate")
+    parser.add_argument('--epsilon', type = float, default = 0.1, help = "probability of a random move")
+    parser.add_argument('--checkpoint', type = int, default = 10000, help = "games between saves of the table")
+    parser.add_argument('--seed', type = int, default = None, help = "seed of the random generator")
+    args = parser.parse_args()
+
+    values = np.array(load_values(args.file)) if os.path.exists(args.file) else None
+
+    def report(games, error):
+        if games % args.checkpoint < args.batch or games == args.games:
+            print("%d games, mean error %.4f" % (games, error))
+
+    train(args.games, values, alpha = args.alpha, epsilon = args.epsilon, batch = args.batch,
+          checkpoint = args.checkpoint, path = args.file, seed = args.seed, report = report)
+
+
+if __name__ == '__main__':
+    main()